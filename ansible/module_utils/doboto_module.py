@@ -2,9 +2,42 @@
 # -*- coding: utf-8 -*-
 
 import os
+import copy
 import time
+import json
+import fcntl
+import shutil
+import socket
+import random
+import hashlib
+import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
 from ansible.module_utils.basic import AnsibleModule
 
+try:
+    from ansible.module_utils.parsing.convert_bool import boolean
+except ImportError:
+    def boolean(value):
+        # Ansible before 2.4 has no convert_bool, so batch items convert the same way here
+
+        if isinstance(value, bool):
+            return value
+
+        normalized = str(value).lower().strip()
+
+        if normalized in ("y", "yes", "on", "1", "true", "t"):
+            return True
+        if normalized in ("n", "no", "off", "0", "false", "f", ""):
+            return False
+
+        raise TypeError("%s is not a valid boolean" % value)
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
 """
 Ansible util for DigitalOcean DOBOTO modules
 (c) 2017, SWE Data <swe-data@do.co>
@@ -25,12 +58,20 @@ along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 try:
+    import requests
+    from doboto import Endpoint as endpoint
     from doboto.DO import DO
     from doboto.exception import DOBOTOException, DOBOTONotFoundException, DOBOTOPollingException
     HAS_DOBOTO = True
 except:
     HAS_DOBOTO = False
 
+try:
+    import jmespath
+    HAS_JMESPATH = True
+except ImportError:
+    HAS_JMESPATH = False
+
 
 def require(*required):
     def requirer(function):
@@ -49,14 +90,937 @@ def require(*required):
     return requirer
 
 
+def invalidate(*resources, **options):
+    def invalidator(function):
+        def wrapper(*args, **kwargs):
+            try:
+                function(*args, **kwargs)
+            finally:
+                if options.get("when") is None or args[0].module.params[options["when"]]:
+                    for resource in resources:
+                        args[0].cache.invalidate(resource)
+                        if args[0].pending:
+                            args[0].cache.hold(resource, args[0].pending)
+        return wrapper
+    return invalidator
+
+
+class DOBOTOCache(object):
+    """
+    On disk cache of read only API results, scoped by token and url
+    """
+
+    size = 16 * 1024 * 1024
+
+    def __init__(self, token, url, path=None):
+
+        if path is None:
+            path = os.environ.get(
+                "DOBOTO_CACHE_DIR", os.path.expanduser("~/.ansible/tmp/doboto")
+            )
+
+        self.path = path
+        self.scope = hashlib.sha256(("%s %s" % (token, url)).encode("utf-8")).hexdigest()
+
+    def directory(self, resource):
+        return os.path.join(self.path, self.scope, resource)
+
+    def key(self, method, args, kwargs):
+        return hashlib.sha256(json.dumps(
+            [method, args, kwargs], sort_keys=True, default=str
+        ).encode("utf-8")).hexdigest()
+
+    def get(self, resource, key, ttl):
+
+        path = os.path.join(self.directory(resource), "%s.json" % key)
+
+        try:
+            with open(path, "r") as cached:
+                entry = json.load(cached)
+        except (IOError, OSError, ValueError):
+            return (False, None)
+
+        if time.time() - entry["stored"] > ttl:
+            return (False, None)
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        return (True, entry["value"])
+
+    def write(self, directory, name, value):
+
+        for path in [self.path, os.path.join(self.path, self.scope), directory]:
+            try:
+                os.makedirs(path, 0o700)
+            except OSError:
+                pass
+
+        try:
+            (handle, temp) = tempfile.mkstemp(dir=directory)
+            with os.fdopen(handle, "w") as cached:
+                json.dump(value, cached)
+            os.rename(temp, os.path.join(directory, name))
+        except (IOError, OSError):
+            return False
+
+        return True
+
+    def set(self, resource, key, value):
+
+        if self.write(self.directory(resource), "%s.json" % key, {"stored": time.time(), "value": value}):
+            self.evict()
+
+    def invalidate(self, resource):
+        shutil.rmtree(self.directory(resource), ignore_errors=True)
+
+    def held(self, resource):
+        """
+        Ids of the actions still changing resource when last checked
+        """
+
+        try:
+            with open(os.path.join(self.path, self.scope, "%s.held" % resource), "r") as held:
+                return json.load(held)
+        except (IOError, OSError, ValueError):
+            return []
+
+    def hold(self, resource, actions):
+        """
+        Holds off caching resource until actions finish
+        """
+
+        self.write(
+            os.path.join(self.path, self.scope), "%s.held" % resource,
+            sorted(set(self.held(resource) + list(actions)))
+        )
+
+    def release(self, resource, actions):
+
+        held = [action for action in self.held(resource) if action not in actions]
+
+        if held:
+            self.write(os.path.join(self.path, self.scope), "%s.held" % resource, held)
+        else:
+            try:
+                os.remove(os.path.join(self.path, self.scope, "%s.held" % resource))
+            except OSError:
+                pass
+
+    def evict(self):
+
+        # Only cached results go, never the actions held or a write in progress
+
+        entries = []
+
+        for (directory, _, files) in os.walk(self.path):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum([entry[1] for entry in entries])
+
+        for (_, size, path) in sorted(entries):
+
+            if total <= self.size:
+                break
+
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class DOBOTOGovernor(object):
+    """
+    Token bucket shared by every process using a token, paced by the API rate limit headers
+    """
+
+    rate = 250 / 60.0
+    burst = 250
+
+    def __init__(self, token, url, path=None):
+
+        if path is None:
+            path = os.environ.get(
+                "DOBOTO_GOVERNOR_DIR", os.path.expanduser("~/.ansible/tmp/doboto_governor")
+            )
+
+        try:
+            os.makedirs(path, 0o700)
+        except OSError:
+            pass
+
+        scope = hashlib.sha256(("%s %s" % (token, url)).encode("utf-8")).hexdigest()
+        self.path = os.path.join(path, "%s.json" % scope)
+
+    def state(self, function):
+        """
+        Calls function with the shared state while holding its lock, saving what it returns
+        """
+
+        descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        with os.fdopen(descriptor, "r+") as shared:
+
+            fcntl.flock(shared, fcntl.LOCK_EX)
+
+            try:
+                state = json.loads(shared.read())
+            except ValueError:
+                state = {"tokens": self.burst, "updated": time.time(), "remaining": None, "reset": 0}
+
+            (state, value) = function(state, time.time())
+
+            shared.seek(0)
+            shared.truncate()
+            shared.write(json.dumps(state))
+
+        return value
+
+    def acquire(self):
+        """
+        Takes a token from the bucket, sleeping until it's due and returning how long that was
+        """
+
+        def take(state, now):
+
+            rate = self.rate
+            hold = 0.0
+
+            if state["remaining"] is not None and state["reset"] > now and \
+               state["remaining"] < self.burst:
+
+                if state["remaining"] < 1:
+                    hold = state["reset"] - now
+                else:
+                    rate = min(rate, state["remaining"] / float(state["reset"] - now))
+
+                state["remaining"] -= 1
+
+            tokens = min(self.burst, state["tokens"] + (now - state["updated"]) * rate)
+            wait = max(hold, 0.0 if tokens >= 1 else (1 - tokens) / rate)
+
+            state["tokens"] = tokens - 1
+            state["updated"] = now
+
+            return (state, wait)
+
+        try:
+            wait = self.state(take)
+        except (IOError, OSError):
+            return 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+    def update(self, response):
+        """
+        Records the rate limit the API reported in a response
+        """
+
+        def record(state, now):
+
+            try:
+                remaining = int(response.headers["RateLimit-Remaining"])
+                reset = int(response.headers["RateLimit-Reset"])
+            except (KeyError, ValueError):
+                (remaining, reset) = (state["remaining"], state["reset"])
+
+            if response.status_code == 429:
+                remaining = 0
+                try:
+                    reset = max(reset, now + int(response.headers["Retry-After"]))
+                except (KeyError, ValueError):
+                    reset = max(reset, now + 1)
+
+            if reset != state["reset"] or state["remaining"] is None:
+                state["remaining"] = remaining
+                state["reset"] = reset
+            elif remaining is not None:
+                state["remaining"] = min(state["remaining"], remaining)
+
+            return (state, None)
+
+        try:
+            self.state(record)
+        except (IOError, OSError):
+            pass
+
+
+class DOBOTOTally(object):
+    """
+    Running totals of the API requests made, kept instead of the requests themselves
+    """
+
+    def __init__(self):
+
+        self.calls = 0
+        self.waits = 0
+        self.waited = 0.0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def append(self, call):
+
+        with self.lock:
+            self.calls += 1
+            self.waits += 1 if call["waited"] > 0 else 0
+            self.waited += call["waited"]
+            self.bytes += call.get("bytes", 0)
+            self.seconds += call.get("seconds", 0.0)
+
+    def extend(self, calls):
+
+        for call in calls:
+            self.append(call)
+
+    def summary(self):
+        return {"calls": self.calls, "waits": self.waits, "waited": self.waited}
+
+
+class DOBOTOTransport(object):
+    """
+    Stands in for the requests module within doboto, reusing keep-alive connections
+    """
+
+    retries = 3
+    per_page = 200
+    max_in_flight = 10
+
+    def __init__(self, pool=10, governor=None):
+
+        self.session = requests.Session()
+
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool, pool_maxsize=pool)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.governor = governor
+        self.calls = DOBOTOTally()
+        self.local = threading.local()
+
+    def request(self, method, url, **kwargs):
+
+        governor = getattr(self.local, "governor", self.governor)
+        calls = getattr(self.local, "calls", self.calls)
+
+        call = {
+            "method": method, "url": urlparse(url).path, "waited": 0.0, "attempts": 0, "seconds": 0.0
+        }
+
+        while True:
+
+            if governor is not None:
+                call["waited"] += governor.acquire()
+
+            call["attempts"] += 1
+            start = time.time()
+            response = self.session.request(method, url, **kwargs)
+            call["seconds"] += time.time() - start
+
+            if governor is not None:
+                governor.update(response)
+
+            if governor is None or response.status_code != 429 or \
+               call["attempts"] > self.retries:
+                break
+
+        call["status"] = response.status_code
+        call["bytes"] = len(response.content)
+        calls.append(call)
+
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+
+def page(self, request_url, expect, params=None):
+    """
+    Fetches one page of a list whole, its links and meta along with the items
+    """
+
+    result = endpoint.requests.get(
+        request_url, params=params, headers=self.headers(), timeout=60
+    ).json()
+
+    if expect not in result:
+        raise DOBOTOException(result=result)
+
+    return result
+
+
+def pages(self, request_url, expect, params=None):
+    """
+    Stands in for Endpoint.pages, fetching the first page at the largest size and
+    the rest, counted from its meta.total, max_in_flight at a time
+    """
+
+    transport = endpoint.requests
+
+    params = dict(params or {})
+    params["per_page"] = transport.per_page
+
+    def fetch(url, params):
+        return page(self, url, expect, params)
+
+    result = fetch(request_url, params)
+    items = list(result[expect])
+
+    following = result.get("links", {}).get("pages", {}).get("next")
+    total = result.get("meta", {}).get("total")
+
+    if not following:
+        return items
+
+    # Without a total there's no knowing how many pages, so follow the links
+
+    if not total or not items:
+
+        while following:
+            result = fetch(following, None)
+            items.extend(result[expect])
+            following = result.get("links", {}).get("pages", {}).get("next")
+
+        return items
+
+    numbers = list(range(2, (total + len(items) - 1) // len(items) + 1))
+    max_in_flight = getattr(transport.local, "max_in_flight", transport.max_in_flight)
+
+    # Workers make their calls as the caller would (governor, where calls are recorded)
+
+    caller = threading.current_thread()
+    local = dict(transport.local.__dict__)
+
+    def numbered(number):
+
+        worker = threading.current_thread() is not caller
+
+        if worker:
+            transport.local.__dict__.update(local)
+
+        try:
+            return fetch(request_url, dict(params, page=number))[expect]
+        finally:
+            if worker:
+                transport.local.__dict__.clear()
+
+    if len(numbers) < 2 or max_in_flight < 2:
+        results = [numbered(number) for number in numbers]
+    else:
+        pool = ThreadPool(min(max_in_flight, len(numbers)))
+        try:
+            results = pool.map(numbered, numbers, 1)
+        finally:
+            pool.close()
+            pool.join()
+
+    for result in results:
+        items.extend(result)
+
+    return items
+
+
+def connect(token, url, agent, pool=10, governor=None):
+    """
+    Creates a DO client whose calls go through a pooled keep-alive session,
+    fetching the pages of lists concurrently
+    """
+
+    endpoint.requests = DOBOTOTransport(pool, governor)
+    endpoint.Endpoint.page = page
+    endpoint.Endpoint.pages = pages
+
+    return DO(token=token, url=url, agent=agent)
+
+
+def described(error):
+    """
+    Describes the error a poll last hit without str(), which DOBOTO exceptions
+    can't do under Python 3
+    """
+
+    if error is None or not isinstance(error, BaseException):
+        return error
+
+    return {
+        "msg": error.args[0] if error.args else error.__class__.__name__,
+        "result": getattr(error, "result", None)
+    }
+
+
+class DOBOTOBroker(object):
+    """
+    Local process holding a warm DO client, serving module runs over a unix socket
+    """
+
+    idle = 300
+    pool = 50
+    start = 10
+
+    def __init__(self, token, url, agent, governed=False, path=None, max_in_flight=None):
+
+        if path is None:
+            path = os.environ.get(
+                "DOBOTO_BROKER_DIR", os.path.expanduser("~/.ansible/tmp/doboto_broker")
+            )
+
+        scope = hashlib.sha256(("%s %s" % (token, url)).encode("utf-8")).hexdigest()[:16]
+
+        self.token = token
+        self.url = url
+        self.agent = agent
+        self.directory = path
+        self.path = os.path.join(path, "%s.sock" % scope)
+        self.idle = int(os.environ.get("DOBOTO_BROKER_IDLE", self.idle))
+        self.governed = governed
+        self.max_in_flight = max_in_flight
+        self.calls = DOBOTOTally()
+        self.local = threading.local()
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def client(self):
+        """
+        Returns a DO like client that sends every call to the broker, starting it if needed
+        """
+
+        try:
+            os.makedirs(self.directory, 0o700)
+        except OSError:
+            pass
+
+        if not self.alive():
+
+            with open("%s.lock" % self.path, "w") as lock:
+
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+                if not self.alive():
+                    self.spawn(lock)
+
+        return DOBOTOBrokerClient(self)
+
+    def alive(self):
+
+        try:
+            self.connection().close()
+        except socket.error:
+            return False
+
+        return True
+
+    def connection(self):
+
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            connection.connect(self.path)
+        except socket.error:
+            connection.close()
+            raise
+
+        return connection
+
+    def spawn(self, lock):
+
+        pid = os.fork()
+
+        if pid == 0:
+
+            lock.close()
+            os.setsid()
+
+            if os.fork() != 0:
+                os._exit(0)
+
+            devnull = os.open(os.devnull, os.O_RDWR)
+
+            for descriptor in [0, 1, 2]:
+                os.dup2(devnull, descriptor)
+
+            try:
+                self.serve()
+            finally:
+                os._exit(0)
+
+        os.waitpid(pid, 0)
+
+        start_time = time.time()
+
+        while not self.alive():
+
+            if time.time() - start_time > self.start:
+                raise DOBOTOException("DOBOTO broker failed to start")
+
+            time.sleep(0.05)
+
+    def call(self, resource, method, args, kwargs):
+
+        try:
+            connection = self.connection()
+        except socket.error as exception:
+            raise DOBOTOException("DOBOTO broker unavailable: %s" % exception)
+
+        try:
+            connection.sendall((json.dumps({
+                "resource": resource,
+                "method": method,
+                "args": args,
+                "kwargs": kwargs,
+                "governed": self.governed,
+                "max_in_flight": getattr(self.local, "max_in_flight", self.max_in_flight)
+            }) + "\n").encode("utf-8"))
+            line = connection.makefile("rb").readline()
+        except socket.error:
+            line = None
+        finally:
+            connection.close()
+
+        if not line:
+            raise DOBOTOException("DOBOTO broker connection lost")
+
+        response = json.loads(line.decode("utf-8"))
+
+        getattr(self.local, "calls", self.calls).extend(response["calls"])
+
+        if "exception" not in response:
+            return response["result"]
+
+        if response["exception"] == "DOBOTONotFoundException":
+            exception = DOBOTONotFoundException(response["message"])
+        elif response["exception"] == "DOBOTOPollingException":
+            exception = DOBOTOPollingException(
+                response["message"], polling=response["polling"], error=response["error"]
+            )
+        else:
+            exception = DOBOTOException(response["message"], result=response["result"])
+
+        raise exception
+
+    def serve(self):
+
+        self.governor = DOBOTOGovernor(self.token, self.url)
+        self.do = connect(self.token, self.url, self.agent, self.pool)
+        self.transport = endpoint.requests
+
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        os.chmod(self.path, 0o600)
+        listener.listen(128)
+        listener.settimeout(self.idle)
+
+        try:
+
+            while True:
+
+                try:
+                    (connection, _) = listener.accept()
+                except socket.timeout:
+                    with self.lock:
+                        if not self.active:
+                            break
+                    continue
+
+                with self.lock:
+                    self.active += 1
+
+                thread = threading.Thread(target=self.handle, args=(connection,))
+                thread.daemon = True
+                thread.start()
+
+        finally:
+
+            listener.close()
+
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def handle(self, connection):
+
+        try:
+
+            connection.settimeout(None)
+            request = json.loads(connection.makefile("rb").readline().decode("utf-8"))
+
+            self.transport.local.governor = self.governor if request.get("governed") else None
+            self.transport.local.calls = []
+            self.transport.local.max_in_flight = request.get("max_in_flight") or self.transport.max_in_flight
+
+            try:
+                response = {"result": getattr(getattr(self.do, request["resource"]), request["method"])(
+                    *request["args"], **request["kwargs"]
+                )}
+            except Exception as exception:
+                response = {
+                    "exception": exception.__class__.__name__,
+                    "message": exception.args[0] if exception.args else exception.__class__.__name__,
+                    "result": getattr(exception, "result", None),
+                    "polling": getattr(exception, "polling", None),
+                    "error": described(getattr(exception, "error", None))
+                }
+
+            response["calls"] = self.transport.local.calls
+
+            connection.sendall((json.dumps(response, default=str) + "\n").encode("utf-8"))
+
+        except (socket.error, ValueError):
+            pass
+
+        finally:
+
+            connection.close()
+
+            with self.lock:
+                self.active -= 1
+
+
+class DOBOTOBrokerClient(object):
+    """
+    DO like client whose endpoint methods are called within the broker
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def __getattr__(self, resource):
+        return DOBOTOBrokerEndpoint(self.broker, resource)
+
+
+class DOBOTOBrokerEndpoint(object):
+
+    def __init__(self, broker, resource):
+        self.broker = broker
+        self.resource = resource
+
+    def __getattr__(self, method):
+
+        def call(*args, **kwargs):
+            return self.broker.call(self.resource, method, list(args), kwargs)
+
+        return call
+
+
+class DOBOTOStats(object):
+    """
+    Counts and times each endpoint method called, with the API requests it made
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.start = time.time()
+        self.slept = 0.0
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    def measure(self, called, function, *args, **kwargs):
+        """
+        Calls function, recording it and the API requests it made under called
+        (not name, which endpoint methods take as a keyword)
+        """
+
+        local = self.transport.local
+        outer = getattr(local, "calls", None)
+        local.calls = []
+        start = time.time()
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+
+            seconds = time.time() - start
+            calls = local.calls
+
+            if outer is None:
+                del local.calls
+                outer = self.transport.calls
+
+            outer.extend(calls)
+
+            with self.lock:
+
+                stats = self.endpoints.setdefault(called, {
+                    "calls": 0, "requests": 0, "retries": 0, "bytes": 0, "seconds": 0.0, "waited": 0.0
+                })
+
+                stats["calls"] += 1
+                stats["seconds"] += seconds
+
+                for call in calls:
+                    stats["requests"] += 1
+                    stats["retries"] += call["attempts"] - 1
+                    stats["bytes"] += call.get("bytes", 0)
+                    stats["waited"] += call["waited"]
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.slept += seconds
+
+    def summary(self):
+        """
+        Totals across endpoints, along with each endpoint's own
+        """
+
+        endpoints = list(self.endpoints.values())
+
+        return {
+            "wall": time.time() - self.start,
+            "api": sum([stats["seconds"] for stats in endpoints]),
+            "slept": self.slept,
+            "waited": sum([stats["waited"] for stats in endpoints]),
+            "calls": sum([stats["calls"] for stats in endpoints]),
+            "requests": sum([stats["requests"] for stats in endpoints]),
+            "retries": sum([stats["retries"] for stats in endpoints]),
+            "bytes": sum([stats["bytes"] for stats in endpoints]),
+            "endpoints": self.endpoints
+        }
+
+
+class DOBOTOStatsClient(object):
+    """
+    DO like client recording every endpoint method called
+    """
+
+    def __init__(self, do, stats):
+        self.do = do
+        self.stats = stats
+
+    def __getattr__(self, resource):
+        return DOBOTOStatsEndpoint(getattr(self.do, resource), resource, self.stats)
+
+
+class DOBOTOStatsEndpoint(object):
+
+    def __init__(self, endpoint, resource, stats):
+        self.endpoint = endpoint
+        self.resource = resource
+        self.stats = stats
+
+    def __getattr__(self, method):
+
+        function = getattr(self.endpoint, method)
+
+        if not callable(function):
+            return function
+
+        name = "%s.%s" % (self.resource, method)
+
+        def call(*args, **kwargs):
+            return self.stats.measure(name, function, *args, **kwargs)
+
+        return call
+
+
+class DOBOTOBatchResult(Exception):
+    """
+    Raised to end one item of a batch with its result
+    """
+
+    def __init__(self, result):
+        super(DOBOTOBatchResult, self).__init__("batch result")
+        self.result = result
+
+
+class DOBOTOBatchModule(object):
+    """
+    Stands in for the AnsibleModule while running one item of a batch
+    """
+
+    def __init__(self, module, params):
+        self.module = module
+        self.params = params
+
+    def __getattr__(self, name):
+        return getattr(self.module, name)
+
+    def exit_json(self, **result):
+        raise DOBOTOBatchResult(result)
+
+    def fail_json(self, **result):
+        result["failed"] = True
+        raise DOBOTOBatchResult(result)
+
+
+def select(value, fields):
+    """
+    Keeps only the dotted path fields of a resource, or of each resource in a list
+    """
+
+    if isinstance(value, list):
+        return [select(item, fields) for item in value]
+
+    if not isinstance(value, dict):
+        return value
+
+    heads = {}
+
+    for field in fields:
+        (head, _, rest) = field.partition(".")
+        heads.setdefault(head, []).append(rest)
+
+    selected = {}
+
+    for (head, rests) in heads.items():
+
+        if head not in value:
+            continue
+
+        if "" in rests:
+            selected[head] = value[head]
+        else:
+            selected[head] = select(value[head], rests)
+
+    return selected
+
+
 class DOBOTOModule(object):
 
-    url = "https://api.digitalocean.com/v2"
+    url = os.environ.get("DO_API_URL", "https://api.digitalocean.com/v2")
     agent = "DOBOTO Ansible"
+    cache_ttl = 300
+    poll_strategy = "backoff"
+    poll_start = 1
+    max_in_flight = 10
+    feed_pages = 5
+    shared = [
+        "token", "url", "transport", "rate_limit", "stats", "fields", "query", "batch", "max_in_flight"
+    ]
+    unprojected = ["changed", "failed", "msg", "item", "results", "rate_limit", "_doboto_stats"]
+    batch_types = ["str", "bool", "int", "list", "dict", "path"]
 
     def __init__(self):
 
         self.module = self.input()
+        self.stats = None
 
         if not HAS_DOBOTO:
             self.module.fail_json(msg="the doboto package is required")
@@ -69,20 +1033,507 @@ class DOBOTOModule(object):
         if token is None:
             self.module.fail_json(msg="the token parameter is required")
 
-        self.do = DO(token=token, url=self.module.params["url"], agent=self.agent)
+        transport = self.module.params.get("transport")
 
-        try:
-            self.act()
-        except DOBOTONotFoundException as exception:
-            self.module.fail_json(msg=exception.message)
-        except DOBOTOPollingException as exception:
-            self.module.fail_json(
-                msg=exception.message,
-                polling=exception.polling,
-                error=exception.error
+        if transport is None:
+            transport = os.environ.get("DOBOTO_TRANSPORT", "direct")
+
+        self.governed = self.module.params.get("rate_limit")
+
+        if self.governed is None:
+            self.governed = os.environ.get("DOBOTO_RATE_LIMIT", "").lower() in ["1", "true", "yes"]
+
+        if transport == "broker":
+            self.transport = DOBOTOBroker(
+                token, self.module.params["url"], self.agent, self.governed,
+                max_in_flight=self.module.params.get("max_in_flight")
             )
+            try:
+                self.do = self.transport.client()
+            except (DOBOTOException, OSError, IOError) as exception:
+                self.module.fail_json(msg="unable to use the DOBOTO broker: %s" % exception)
+        elif transport == "direct":
+            governor = None
+            if self.governed:
+                governor = DOBOTOGovernor(token, self.module.params["url"])
+            self.do = connect(token, self.module.params["url"], self.agent, governor=governor)
+            self.transport = endpoint.requests
+            if self.module.params.get("max_in_flight"):
+                self.transport.max_in_flight = self.module.params["max_in_flight"]
+        else:
+            self.module.fail_json(msg="the transport must be direct or broker")
+
+        stats = self.module.params.get("stats")
+
+        if stats is None:
+            stats = os.environ.get("DOBOTO_STATS", "").lower() in ["1", "true", "yes"]
+
+        if stats:
+            self.stats = DOBOTOStats(self.transport)
+            self.do = DOBOTOStatsClient(self.do, self.stats)
+
+        self.query = None
+
+        if self.module.params.get("query"):
+
+            if not HAS_JMESPATH:
+                self.module.fail_json(msg="the jmespath package is required for query")
+
+            try:
+                self.query = jmespath.compile(self.module.params["query"])
+            except jmespath.exceptions.ParseError as exception:
+                self.module.fail_json(msg="invalid query: %s" % exception)
+
+        self.cache = DOBOTOCache(token, self.module.params["url"])
+        self.pending = []
+
+        exit_json = self.module.exit_json
+        fail_json = self.module.fail_json
+        self.module.exit_json = lambda **result: exit_json(**self.output(self.project(result)))
+        self.module.fail_json = lambda **result: fail_json(**self.output(result))
+
+        try:
+            if self.module.params.get("batch"):
+                self.batch()
+            else:
+                self.act()
         except DOBOTOException as exception:
-            self.module.fail_json(msg=exception.message, result=exception.result)
+            self.module.fail_json(**self.failure(exception))
 
     def act(self):
         getattr(self, self.module.params["action"])()
+
+    def failure(self, exception):
+        """
+        Turns a DOBOTO exception into the failure result to return
+        """
+
+        result = {"msg": exception.args[0] if exception.args else "DO API Error"}
+
+        if isinstance(exception, DOBOTOPollingException):
+            result["polling"] = exception.polling
+            result["error"] = described(exception.error)
+        elif not isinstance(exception, DOBOTONotFoundException):
+            result["result"] = exception.result
+
+        return result
+
+    def attempt(self, function, *args, **kwargs):
+        """
+        Calls function, returning its result and None, or None and the failure it raised
+        """
+
+        try:
+            return (function(*args, **kwargs), None)
+        except DOBOTOException as exception:
+            return (None, self.failure(exception))
+
+    def attempt_transient(self, function, *args, **kwargs):
+        """
+        Like attempt, but also returns as failures the connection errors, timeouts and error
+        bodies that aren't JSON that DOBOTO lets through, marking those transient
+        """
+
+        try:
+            return self.attempt(function, *args, **kwargs)
+        except (requests.exceptions.RequestException, ValueError) as exception:
+            return (None, {"msg": "DO API request failed: %s" % exception, "transient": True})
+
+    def found(self, function, *args, **kwargs):
+        """
+        Calls function, returning None if what it looks up isn't found
+        """
+
+        try:
+            return function(*args, **kwargs)
+        except DOBOTONotFoundException:
+            return None
+
+    def concurrently(self, function, items):
+        """
+        Calls function with each item, max_in_flight at a time, returning results in order
+        and raising the first exception any call raised once all are done
+        """
+
+        max_in_flight = self.module.params.get("max_in_flight") or self.max_in_flight
+
+        if len(items) < 2 or max_in_flight < 2:
+            return [function(item) for item in items]
+
+        # Pool workers only catch Exception, so anything else (like the SystemExit of
+        # fail_json) would leave its result unset and map waiting forever
+
+        def call(item):
+            try:
+                return (function(item), None)
+            except BaseException as exception:
+                return (None, exception)
+
+        pool = ThreadPool(min(max_in_flight, len(items)))
+
+        try:
+            outcomes = pool.map(call, items, 1)
+        finally:
+            pool.close()
+            pool.join()
+
+        for (_, exception) in outcomes:
+            if exception is not None:
+                raise exception
+
+        return [result for (result, _) in outcomes]
+
+    def batch(self):
+        """
+        Runs the action once for each item of batch, each item overriding params
+        """
+
+        # Items run max_in_flight at a time, so an item run alongside others makes its
+        # own calls one at a time to keep the whole run within max_in_flight
+
+        caller = threading.current_thread()
+
+        def run(item):
+
+            params = copy.copy(self.module.params)
+            params["batch"] = None
+
+            alongside = threading.current_thread() is not caller
+
+            if alongside:
+                params["max_in_flight"] = 1
+
+            for (name, value) in item.items():
+
+                if name not in self.module.argument_spec or name in self.shared:
+                    return {"failed": True, "item": item, "msg": "%s can't be used in a batch" % name}
+
+                spec = self.module.argument_spec[name]
+                kind = spec.get("type", "str")
+
+                if kind not in self.batch_types:
+                    return {"failed": True, "item": item, "msg": "%s can't be used in a batch" % name}
+
+                try:
+                    if value is None:
+                        pass
+                    elif kind == "bool":
+                        value = boolean(value)
+                    elif kind == "int":
+                        value = int(value)
+                    elif kind == "path":
+                        value = os.path.expanduser(os.path.expandvars(value))
+                    elif kind == "dict" and not isinstance(value, dict):
+                        raise TypeError("%s must be a dict" % name)
+                    elif kind == "list" and not isinstance(value, list):
+                        value = [value]
+                except (TypeError, ValueError):
+                    return {"failed": True, "item": item, "msg": "%s is an invalid %s" % (name, kind)}
+
+                if "choices" in spec and value not in spec["choices"]:
+                    return {"failed": True, "item": item, "msg": "%s must be one of %s" % (
+                        name, ", ".join(spec["choices"])
+                    )}
+
+                params[name] = value
+
+            runner = copy.copy(self)
+            runner.module = DOBOTOBatchModule(self.module, params)
+
+            if alongside:
+                self.transport.local.max_in_flight = 1
+
+            try:
+                runner.act()
+                result = {"failed": True, "msg": "no result"}
+            except DOBOTOBatchResult as exception:
+                result = exception.result
+                if not result.get("failed"):
+                    result = self.project(result)
+            except DOBOTOException as exception:
+                result = self.failure(exception)
+                result["failed"] = True
+            except Exception as exception:
+                result = {"failed": True, "msg": str(exception)}
+            finally:
+                if alongside:
+                    del self.transport.local.max_in_flight
+
+            result["item"] = item
+
+            return result
+
+        results = self.concurrently(run, self.module.params["batch"])
+
+        changed = any([result.get("changed", False) for result in results])
+        failed = len([result for result in results if result.get("failed")])
+
+        if failed:
+            self.module.fail_json(
+                msg="%s of %s batch items failed" % (failed, len(results)),
+                changed=changed, results=results
+            )
+
+        self.module.exit_json(changed=changed, results=results)
+
+    def project(self, result):
+        """
+        Trims what a result returns to the query and fields asked for
+        """
+
+        fields = self.module.params.get("fields")
+
+        if self.query is None and not fields:
+            return result
+
+        for (key, value) in list(result.items()):
+
+            if key in self.unprojected:
+                continue
+
+            if self.query is not None:
+                value = self.query.search(value)
+
+            if fields:
+                value = select(value, fields)
+
+            result[key] = value
+
+        return result
+
+    def output(self, result):
+        """
+        Adds how the API calls went to a module result
+        """
+
+        if self.governed:
+            result["rate_limit"] = self.transport.calls.summary()
+
+        if self.stats is not None:
+            result["_doboto_stats"] = self.stats.summary()
+
+        return result
+
+    def sleep(self, seconds):
+
+        if self.stats is not None:
+            self.stats.sleep(seconds)
+
+        time.sleep(seconds)
+
+    def intervals(self):
+        """
+        Yields how long to sleep before each check while waiting
+
+        fixed sleeps poll seconds each time, backoff starts at poll_start seconds and doubles
+        up to poll, each with jitter so concurrent runs spread out
+        """
+
+        poll = max(self.module.params["poll"], 1)
+        strategy = self.module.params.get("poll_strategy") or self.poll_strategy
+
+        if strategy == "fixed":
+            while True:
+                yield poll
+
+        delay = min(self.poll_start, poll)
+
+        while True:
+            yield random.uniform(delay / 2.0, delay)
+            delay = min(delay * 2, poll)
+
+    def wait_for(self, subject, refresh, ready=None, missing_only=False):
+        """
+        Refreshes subject until it's ready (or refreshes once if ready is None), within timeout,
+        retrying refreshes the API failed (only those not finding it yet if missing_only)
+        """
+
+        start_time = time.time()
+        intervals = self.intervals()
+        refreshed = False
+        retried = DOBOTONotFoundException if missing_only else DOBOTOException
+
+        while not (ready(subject) if ready is not None else refreshed):
+
+            remaining = self.module.params["timeout"] - (time.time() - start_time)
+
+            if remaining <= 0:
+                raise DOBOTOPollingException(polling=subject)
+
+            self.sleep(min(next(intervals), remaining))
+
+            try:
+                subject = refresh(subject)
+                refreshed = True
+            except retried as exception:
+                if time.time() - start_time > self.module.params["timeout"]:
+                    raise DOBOTOPollingException(polling=subject, error=exception)
+
+        return subject
+
+    def action_result(self, action):
+        """
+        Waits for an action to finish if asked to
+        """
+
+        if not self.module.params["wait"]:
+            self.unfinished([action])
+            return action
+
+        return self.wait_for(
+            action,
+            lambda action: self.do.action.info(action["id"]),
+            lambda action: action["status"] != "in-progress"
+        )
+
+    def actions_result(self, actions):
+        """
+        Waits for several actions to finish if asked to
+        """
+
+        if not self.module.params["wait"]:
+            self.unfinished(actions)
+            return actions
+
+        return self.actions_wait(actions)
+
+    def unfinished(self, actions):
+        """
+        Notes actions returned still in progress, so what they change isn't cached until they finish
+        """
+
+        self.pending.extend([action["id"] for action in actions if action["status"] == "in-progress"])
+
+    def actions_wait(self, actions):
+        """
+        Waits for several actions to finish, finding them in the action feed and only
+        checking on those not found there one by one
+        """
+
+        def refresh(actions):
+
+            pending = [index for (index, action) in enumerate(actions) if action["status"] == "in-progress"]
+
+            if len(pending) > 1:
+
+                oldest = min([actions[index]["id"] for index in pending])
+                found = self.feed(
+                    [actions[index]["id"] for index in pending],
+                    lambda action: action["id"],
+                    lambda action: action["id"] <= oldest
+                )
+
+                for index in pending:
+                    actions[index] = found.get(actions[index]["id"], actions[index])
+
+                pending = [index for index in pending if actions[index]["id"] not in found]
+
+            for (index, action) in zip(pending, self.concurrently(
+                lambda index: self.do.action.info(actions[index]["id"]), pending
+            )):
+                actions[index] = action
+
+            return actions
+
+        try:
+            return self.wait_for(
+                actions,
+                refresh,
+                lambda actions: all([action["status"] != "in-progress" for action in actions])
+            )
+        except DOBOTOPollingException as exception:
+
+            stragglers = [
+                str(action["id"]) for action in exception.polling if action["status"] == "in-progress"
+            ]
+
+            raise DOBOTOPollingException(
+                "DO API Timeout with %s actions still in-progress: %s" % (
+                    len(stragglers), ", ".join(stragglers)
+                ),
+                polling=exception.polling, error=exception.error
+            )
+
+    def feed(self, keys, key, older=None):
+        """
+        Finds actions by key in the account's action feed, reading it newest first a page at
+        a time until all are found, a page ends older than wanted, or feed_pages are read
+        """
+
+        keys = set(keys)
+        found = {}
+
+        for (number, page) in enumerate(self.paged("action", "actions", "actions"), 1):
+
+            for action in page:
+                if key(action) in keys:
+                    found.setdefault(key(action), action)
+
+            if len(found) == len(keys) or number >= self.feed_pages or \
+               (older is not None and page and older(page[-1])):
+                break
+
+        return found
+
+    def paged(self, resource, path, key):
+        """
+        Reads a listing a page at a time, yielding each page as it arrives rather than
+        holding them all, and following each page's next link (the API may cap per_page)
+        """
+
+        url = "%s/%s" % (self.module.params["url"], path)
+        params = {"per_page": DOBOTOTransport.per_page}
+
+        while url:
+
+            result = getattr(self.do, resource).page(url, key, params=params)
+
+            yield result[key]
+
+            if not result[key]:
+                break
+
+            url = result.get("links", {}).get("pages", {}).get("next")
+            params = None
+
+    def cached(self, resource, method, *args, **kwargs):
+        """
+        Calls a read only endpoint method, using the on disk cache if enabled and no
+        action changing what it reads is still in progress
+        """
+
+        call = getattr(getattr(self.do, resource), method)
+
+        if not self.module.params.get("cache"):
+            return call(*args, **kwargs)
+
+        ttl = self.module.params.get("cache_ttl")
+
+        if ttl is None:
+            ttl = self.cache_ttl
+
+        held = self.cache.held(resource)
+
+        if held:
+
+            finished = [
+                held[index] for (index, action) in enumerate(self.concurrently(
+                    lambda id: self.found(self.do.action.info, id), held
+                )) if action is None or action["status"] != "in-progress"
+            ]
+
+            if finished:
+                self.cache.release(resource, finished)
+                self.cache.invalidate(resource)
+
+            if len(finished) < len(held):
+                return call(*args, **kwargs)
+
+        key = self.cache.key(method, args, kwargs)
+        (hit, value) = self.cache.get(resource, key, ttl)
+
+        if not hit:
+            value = call(*args, **kwargs)
+            self.cache.set(resource, key, value)
+
+        return value
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.doboto_module import require, DOBOTOModule
+from ansible.module_utils.doboto_module import require, invalidate, DOBOTOModule
 
 """
 Ansible module to manage DigitalOcean
@@ -54,7 +54,25 @@ options:
     certificate_chain:
         description: same as DO API variable
     url:
-        description: URL to use if not official (for experimenting)
+        description: URL to use if not official (for experimenting, uses DO_API_URL from ENV if not found)
+    transport:
+        description: direct, or broker to share a warm keep-alive client across runs (uses DOBOTO_TRANSPORT from ENV if not found, default direct)
+    rate_limit:
+        description: pace API calls across all processes using this token and report the calls made, how many waited and for how long (uses DOBOTO_RATE_LIMIT from ENV if not found)
+    stats:
+        description: return _doboto_stats with per endpoint call counts, bytes received, API time and time sleeping in polls and retries (uses DOBOTO_STATS from ENV if not found)
+    fields:
+        description: dotted paths of the fields to keep in each resource returned, like id or networks.v4.ip_address
+    query:
+        description: JMESPath expression to apply to what's returned before fields (requires jmespath)
+    batch:
+        description: list of items, each overriding options for one run of the action, run concurrently with results in the same order
+    max_in_flight:
+        description: most API operations to run at once within this run (default 10)
+    cache:
+        description: serve list and info results from an on disk cache (uses DOBOTO_CACHE_DIR from ENV, default ~/.ansible/tmp/doboto)
+    cache_ttl:
+        description: seconds a cached result is reused (default 300 seconds)
 '''
 
 EXAMPLES = '''
@@ -122,12 +140,22 @@ class Certificate(DOBOTOModule):
             private_key=dict(default=None),
             leaf_certificate=dict(default=None),
             certificate_chain=dict(default=None),
+            cache=dict(default=False, type='bool'),
+            cache_ttl=dict(default=None, type='int'),
+            transport=dict(default=None, choices=["direct", "broker"]),
+            rate_limit=dict(default=None, type='bool'),
+            stats=dict(default=None, type='bool'),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            batch=dict(default=None, type='list'),
+            max_in_flight=dict(default=None, type='int'),
             url=dict(default=self.url),
         ))
 
     def list(self):
-        self.module.exit_json(changed=False, certificates=self.do.certificate.list())
+        self.module.exit_json(changed=False, certificates=self.cached("certificate", "list"))
 
+    @invalidate("certificate")
     @require("name")
     @require("private_key")
     @require("leaf_certificate")
@@ -142,6 +170,7 @@ class Certificate(DOBOTOModule):
         )
         self.module.exit_json(changed=True, certificate=certificate)
 
+    @invalidate("certificate")
     @require("name")
     @require("private_key")
     @require("leaf_certificate")
@@ -161,10 +190,11 @@ class Certificate(DOBOTOModule):
 
     @require("id")
     def info(self):
-        self.module.exit_json(changed=False, certificate=self.do.certificate.info(
-            self.module.params["id"]
+        self.module.exit_json(changed=False, certificate=self.cached(
+            "certificate", "info", self.module.params["id"]
         ))
 
+    @invalidate("certificate")
     @require("id")
     def destroy(self):
         self.module.exit_json(changed=True, result=self.do.certificate.destroy(
@@ -1,8 +1,14 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import os
+import re
+import stat
+import hashlib
+import tempfile
+import threading
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.doboto_module import require, DOBOTOModule
+from ansible.module_utils.doboto_module import require, invalidate, DOBOTOModule
 
 """
 Ansible module to manage DigitalOcean domains
@@ -47,6 +53,9 @@ options:
             - record_info
             - record_update
             - record_destroy
+            - record_sync
+            - zone_import
+            - zone_export
     name:
         description: same as DO API variable
     ip_address:
@@ -54,19 +63,41 @@ options:
     record_id:
         description: same as DO API variable id for records
     record_type:
-        description: same as DO API variable type for records
+        description: same as DO API variable type for records, with record_name finds the record for record_info, record_update and record_destroy if no record_id
     record_name:
         description: same as DO API variable name for records
     record_data:
-        description: same as DO API variable data for records
+        description: same as DO API variable data for records, also narrows down the record found for record_info and record_destroy
     record_priority:
         description: same as DO API variable priority for records
     record_port:
         description: same as DO API variable port for records
     record_weight:
         description: same as DO API variable weight for records
+    records:
+        description: for record_sync, every record the domain should have, each with type, name and data and optionally priority, port, weight, ttl, flags and tag (SOA and unlisted @ NS records are left alone)
+    path:
+        description: BIND zone file to read records from with zone_import (creating those not already there) or write them to with zone_export
     url:
-        description: URL to use if not official (for experimenting)
+        description: URL to use if not official (for experimenting, uses DO_API_URL from ENV if not found)
+    transport:
+        description: direct, or broker to share a warm keep-alive client across runs (uses DOBOTO_TRANSPORT from ENV if not found, default direct)
+    rate_limit:
+        description: pace API calls across all processes using this token and report the calls made, how many waited and for how long (uses DOBOTO_RATE_LIMIT from ENV if not found)
+    stats:
+        description: return _doboto_stats with per endpoint call counts, bytes received, API time and time sleeping in polls and retries (uses DOBOTO_STATS from ENV if not found)
+    fields:
+        description: dotted paths of the fields to keep in each resource returned, like id or networks.v4.ip_address
+    query:
+        description: JMESPath expression to apply to what's returned before fields (requires jmespath)
+    batch:
+        description: list of items, each overriding options for one run of the action, run concurrently with results in the same order
+    max_in_flight:
+        description: most API operations to run at once within this run (default 10)
+    cache:
+        description: serve list and info results, and the records found by type and name, from an on disk cache (uses DOBOTO_CACHE_DIR from ENV, default ~/.ansible/tmp/doboto)
+    cache_ttl:
+        description: seconds a cached result is reused (default 300 seconds)
 '''
 
 EXAMPLES = '''
@@ -126,6 +157,37 @@ EXAMPLES = '''
     record_data: domain.create.com.
   register: domain_record_update
 
+- name: domain | record | sync
+  doboto_domain:
+    action: record_sync
+    name: domain.create.com
+    records:
+      - type: A
+        name: "@"
+        data: 1.2.3.4
+      - type: CNAME
+        name: www
+        data: "@"
+      - type: MX
+        name: "@"
+        data: mail.domain.create.com
+        priority: 10
+  register: domain_record_sync
+
+- name: domain | zone | export
+  doboto_domain:
+    action: zone_export
+    name: domain.create.com
+    path: /tmp/domain.create.com.zone
+  register: domain_zone_export
+
+- name: domain | zone | import
+  doboto_domain:
+    action: zone_import
+    name: domain.create.com
+    path: /tmp/domain.create.com.zone
+  register: domain_zone_import
+
 - name: domain | record | destroy
   doboto_domain:
     action: record_destroy
@@ -144,6 +206,17 @@ EXAMPLES = '''
 
 class Domain(DOBOTOModule):
 
+    zone_batch = 100
+    zone_classes = ["IN", "CH", "HS"]
+    zone_units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+    def __init__(self):
+
+        self.index = {}
+        self.indexing = threading.Lock()
+
+        super(Domain, self).__init__()
+
     def input(self):
         return AnsibleModule(argument_spec=dict(
             action=dict(default=None, required=True, choices=[
@@ -156,7 +229,10 @@ class Domain(DOBOTOModule):
                 "record_create",
                 "record_info",
                 "record_update",
-                "record_destroy"
+                "record_destroy",
+                "record_sync",
+                "zone_import",
+                "zone_export"
             ]),
             token=dict(default=None, no_log=True),
             name=dict(default=None),
@@ -168,12 +244,24 @@ class Domain(DOBOTOModule):
             record_priority=dict(default=None),
             record_port=dict(default=None),
             record_weight=dict(default=None),
+            records=dict(default=None, type='list'),
+            path=dict(default=None, type='path'),
+            transport=dict(default=None, choices=["direct", "broker"]),
+            rate_limit=dict(default=None, type='bool'),
+            stats=dict(default=None, type='bool'),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            batch=dict(default=None, type='list'),
+            max_in_flight=dict(default=None, type='int'),
+            cache=dict(default=False, type='bool'),
+            cache_ttl=dict(default=None, type='int'),
             url=dict(default=self.url)
         ))
 
     def list(self):
-        self.module.exit_json(changed=False, domains=self.do.domain.list())
+        self.module.exit_json(changed=False, domains=self.cached("domain", "list"))
 
+    @invalidate("domain")
     @require("name")
     @require("ip_address")
     def create(self):
@@ -181,6 +269,7 @@ class Domain(DOBOTOModule):
             self.module.params["name"], self.module.params["ip_address"]
         ))
 
+    @invalidate("domain")
     @require("name")
     @require("ip_address")
     def present(self):
@@ -191,10 +280,11 @@ class Domain(DOBOTOModule):
 
     @require("name")
     def info(self):
-        self.module.exit_json(changed=False, domain=self.do.domain.info(
-            self.module.params["name"]
+        self.module.exit_json(changed=False, domain=self.cached(
+            "domain", "info", self.module.params["name"]
         ))
 
+    @invalidate("domain")
     @require("name")
     def destroy(self):
         self.module.exit_json(changed=True, result=self.do.domain.destroy(
@@ -203,10 +293,83 @@ class Domain(DOBOTOModule):
 
     @require("name")
     def record_list(self):
-        self.module.exit_json(changed=False, domain_records=self.do.domain.record_list(
-            self.module.params["name"]
+        self.module.exit_json(changed=False, domain_records=self.cached(
+            "domain", "record_list", self.module.params["name"]
         ))
 
+    def indexed_records(self, name):
+        """
+        The domain's records by type and name, built once a run from one record list (cached on
+        disk with cache)
+        """
+
+        with self.indexing:
+
+            if name not in self.index:
+
+                self.index[name] = {}
+
+                for record in self.cached("domain", "record_list", name):
+                    self.index[name].setdefault(self.record_key(record)[:2], []).append(record)
+
+            return self.index[name]
+
+    def reindex(self, name, record=None, id=None):
+        """
+        Keeps this run's index of a domain's records current with a record written or destroyed
+        """
+
+        with self.indexing:
+
+            if name not in self.index:
+                return
+
+            ids = [str(id), str((record or {}).get("id"))]
+
+            for records in self.index[name].values():
+                records[:] = [indexed for indexed in records if str(indexed["id"]) not in ids]
+
+            if record is not None:
+                self.index[name].setdefault(self.record_key(record)[:2], []).append(record)
+
+    def indexed_record(self, data=True):
+        """
+        The one record of record_type and record_name, and record_data if given and data, in the
+        domain's index, failing if there's none or more than one
+        """
+
+        if self.module.params["record_type"] is None or self.module.params["record_name"] is None:
+            self.module.fail_json(msg="the record_id or record_type and record_name parameters are required")
+
+        key = self.record_key({
+            "type": self.module.params["record_type"],
+            "name": self.module.params["record_name"],
+            "data": self.module.params["record_data"] or ""
+        })
+
+        records = [
+            record for record in self.indexed_records(self.module.params["name"]).get(key[:2], [])
+            if not data or self.module.params["record_data"] is None or self.record_key(record) == key
+        ]
+
+        if len(records) != 1:
+            self.module.fail_json(msg="%s %s records named %s found, give record_id%s" % (
+                len(records), key[0], self.module.params["record_name"], " or record_data" if data else ""
+            ))
+
+        return records[0]
+
+    def record_id(self, data=True):
+        """
+        The record_id given, or the id of the record found by type and name
+        """
+
+        if self.module.params["record_id"] is not None:
+            return self.module.params["record_id"]
+
+        return self.indexed_record(data)["id"]
+
+    @invalidate("domain")
     @require("name")
     def record_create(self):
 
@@ -223,19 +386,25 @@ class Domain(DOBOTOModule):
             if self.module.params["record_%s" % field] is not None:
                 attribs[field] = self.module.params["record_%s" % field]
 
-        self.module.exit_json(changed=True, domain_record=self.do.domain.record_create(
-            self.module.params["name"], attribs
-        ))
+        record = self.do.domain.record_create(self.module.params["name"], attribs)
+        self.reindex(self.module.params["name"], record)
+
+        self.module.exit_json(changed=True, domain_record=record)
 
     @require("name")
-    @require("record_id")
+    @require("record_id", "record_type")
     def record_info(self):
-        self.module.exit_json(changed=False, domain_record=self.do.domain.record_info(
-            self.module.params["name"], self.module.params["record_id"]
+
+        if self.module.params["record_id"] is None:
+            self.module.exit_json(changed=False, domain_record=self.indexed_record())
+
+        self.module.exit_json(changed=False, domain_record=self.cached(
+            "domain", "record_info", self.module.params["name"], self.module.params["record_id"]
         ))
 
+    @invalidate("domain")
     @require("name")
-    @require("record_id")
+    @require("record_id", "record_type")
     def record_update(self):
 
         attribs = {}
@@ -251,16 +420,527 @@ class Domain(DOBOTOModule):
             if self.module.params["record_%s" % field] is not None:
                 attribs[field] = self.module.params["record_%s" % field]
 
-        self.module.exit_json(changed=True, domain_record=self.do.domain.record_update(
-            self.module.params["name"], self.module.params["record_id"], attribs
-        ))
+        record = self.do.domain.record_update(self.module.params["name"], self.record_id(False), attribs)
+        self.reindex(self.module.params["name"], record)
+
+        self.module.exit_json(changed=True, domain_record=record)
 
+    @invalidate("domain")
     @require("name")
-    @require("record_id")
+    @require("record_id", "record_type")
     def record_destroy(self):
-        self.module.exit_json(changed=True, result=self.do.domain.record_destroy(
-            self.module.params["name"], self.module.params["record_id"]
-        ))
+
+        record_id = self.record_id()
+        result = self.do.domain.record_destroy(self.module.params["name"], record_id)
+        self.reindex(self.module.params["name"], id=record_id)
+
+        self.module.exit_json(changed=True, result=result)
+
+    def record_key(self, record):
+        """
+        A record's type, name and data, compared as the API stores them
+        """
+
+        domain = self.module.params["name"].rstrip(".").lower()
+
+        def relative(value):
+
+            value = str(value).rstrip(".").lower()
+
+            if value == domain:
+                return "@"
+
+            if value.endswith(".%s" % domain):
+                return value[:-len(domain) - 1]
+
+            return value
+
+        data = str(record["data"])
+
+        if record["type"] in ["CNAME", "MX", "NS", "SRV"]:
+            data = relative(data)
+
+        return (record["type"].upper(), relative(record["name"]), data)
+
+    @invalidate("domain")
+    @require("name")
+    @require("records")
+    def record_sync(self):
+        """
+        Makes the domain's records exactly records from one record list, updating records in
+        place where it can, destroying the rest of the extras and creating the rest of the missing
+        """
+
+        numbers = ["priority", "port", "weight", "ttl", "flags"]
+        fields = numbers + ["tag"]
+        desired = []
+
+        for record in self.module.params["records"]:
+
+            if not isinstance(record, dict) or [
+                field for field in ["type", "name", "data"] if record.get(field) in [None, ""]
+            ]:
+                self.module.fail_json(msg="each of records needs a type, name and data")
+
+            attribs = {"type": str(record["type"]).upper(), "name": record["name"], "data": record["data"]}
+
+            for field in numbers:
+                if record.get(field) is not None:
+                    try:
+                        attribs[field] = int(record[field])
+                    except (TypeError, ValueError):
+                        self.module.fail_json(msg="%s of %s record %s must be a number, not %s" % (
+                            field, attribs["type"], attribs["name"], record[field]
+                        ))
+
+            if record.get("tag") is not None:
+                attribs["tag"] = str(record["tag"])
+
+            desired.append(attribs)
+
+        keys = [self.record_key(attribs) for attribs in desired]
+        existing = []
+
+        for record in self.do.domain.record_list(self.module.params["name"]):
+
+            if record["type"] == "SOA" or (
+                record["type"] == "NS" and self.record_key(record)[1] == "@" and
+                not [key for key in keys if key[:2] == ("NS", "@")]
+            ):
+                continue
+
+            existing.append(record)
+
+        unmatched = {}
+
+        for record in existing:
+            unmatched.setdefault(self.record_key(record), []).append(record)
+
+        unchanged = []
+        updates = []
+        missing = []
+
+        for (attribs, key) in zip(desired, keys):
+
+            if unmatched.get(key):
+
+                record = unmatched[key].pop(0)
+
+                if [field for field in fields if field in attribs and attribs[field] != record.get(field)]:
+                    updates.append((record, attribs))
+                else:
+                    unchanged.append(record)
+
+            else:
+                missing.append((attribs, key))
+
+        extras = [record for records in unmatched.values() for record in records]
+        creates = []
+
+        for (attribs, key) in missing:
+
+            reused = [record for record in extras if self.record_key(record)[:2] == key[:2]]
+
+            if reused:
+                extras.remove(reused[0])
+                updates.append((reused[0], attribs))
+            else:
+                creates.append(attribs)
+
+        def destroy(record):
+            (_, failure) = self.attempt(self.do.domain.record_destroy, self.module.params["name"], record["id"])
+            return (record, failure)
+
+        def update(change):
+            (record, attribs) = change
+            return self.attempt(self.do.domain.record_update, self.module.params["name"], record["id"], attribs)
+
+        def create(attribs):
+            return self.attempt(self.do.domain.record_create, self.module.params["name"], attribs)
+
+        destroyed = self.concurrently(destroy, extras)
+        updated = self.concurrently(update, updates)
+        created = self.concurrently(create, creates)
+
+        failures = [
+            dict(failure, record=record) for (record, failure) in destroyed if failure is not None
+        ] + [
+            dict(failure, record=attribs) for ((_, attribs), (_, failure)) in zip(updates, updated)
+            if failure is not None
+        ] + [
+            dict(failure, record=attribs) for (attribs, (_, failure)) in zip(creates, created)
+            if failure is not None
+        ]
+
+        result = {
+            "changed": len(failures) < len(extras) + len(updates) + len(creates),
+            "created": [record for (record, failure) in created if failure is None],
+            "updated": [record for (record, failure) in updated if failure is None],
+            "destroyed": [record for (record, failure) in destroyed if failure is None],
+            "unchanged": unchanged
+        }
+
+        if failures:
+            self.module.fail_json(
+                msg="%s of %s record changes failed" % (len(failures), len(extras) + len(updates) + len(creates)),
+                failures=failures, **result
+            )
+
+        self.module.exit_json(**result)
+
+    def zone_entries(self, lines):
+        """
+        Splits zone file lines into entries, each the line it starts on, whether it starts with
+        its owner name and its tokens, joining lines in parentheses and dropping comments
+        """
+
+        tokens = []
+        depth = 0
+
+        for (number, line) in enumerate(lines, 1):
+
+            line = line.rstrip("\r\n")
+
+            if depth == 0:
+                start = number
+                owned = not line[:1].isspace()
+
+            token = None
+            quoted = False
+            escaped = False
+
+            for char in line:
+
+                if quoted:
+                    token += char
+                    if escaped:
+                        escaped = False
+                    elif char == "\\":
+                        escaped = True
+                    elif char == '"':
+                        quoted = False
+                elif char == '"':
+                    token = (token or "") + char
+                    quoted = True
+                elif char == ";":
+                    break
+                elif char.isspace() or char in "()":
+                    if token is not None:
+                        tokens.append(token)
+                        token = None
+                    if char == "(":
+                        depth += 1
+                    elif char == ")":
+                        depth -= 1
+                else:
+                    token = (token or "") + char
+
+            if token is not None:
+                tokens.append(token)
+
+            if depth == 0 and tokens:
+                yield (start, owned, tokens)
+                tokens = []
+
+        if tokens:
+            yield (start, owned, tokens)
+
+    def zone_seconds(self, value):
+        """
+        A zone file TTL, like 3600 or 1h30m, in seconds
+        """
+
+        parts = re.findall(r"(\d+)([smhdwSMHDW]?)", value)
+
+        if not parts or "".join(["".join(part) for part in parts]) != value:
+            raise ValueError("%s isn't a TTL" % value)
+
+        return sum([int(count) * self.zone_units[unit.lower() or "s"] for (count, unit) in parts])
+
+    def zone_text(self, value):
+        """
+        A zone file character string without its quotes and escapes
+        """
+
+        if len(value) > 1 and value.startswith('"') and value.endswith('"'):
+            value = value[1:-1]
+
+        return re.sub(r"\\(.)", r"\1", value)
+
+    def zone_records(self, lines):
+        """
+        Turns zone file lines into record attribs, yielding each with the line it starts on and
+        None, or None and what's wrong with it, or None and None for SOA records, which the API
+        manages itself
+        """
+
+        domain = "%s." % self.module.params["name"].rstrip(".").lower()
+        state = {"origin": domain, "ttl": None, "owner": None}
+
+        def absolute(name):
+
+            name = name.lower()
+
+            if name == "@":
+                return state["origin"]
+
+            if name.endswith("."):
+                return name
+
+            return "%s.%s" % (name, state["origin"])
+
+        def relative(name):
+
+            if name == domain:
+                return "@"
+
+            if name.endswith(".%s" % domain):
+                return name[:-len(domain) - 1]
+
+            raise ValueError("%s is outside of %s" % (name, domain))
+
+        def target(name):
+
+            name = absolute(name)
+
+            return "@" if name == domain else name
+
+        for (number, owned, tokens) in self.zone_entries(lines):
+
+            try:
+
+                if tokens[0].upper() == "$ORIGIN":
+                    state["origin"] = absolute(tokens[1])
+                    continue
+
+                if tokens[0].upper() == "$TTL":
+                    state["ttl"] = self.zone_seconds(tokens[1])
+                    continue
+
+                if tokens[0].startswith("$"):
+                    raise ValueError("%s isn't supported" % tokens[0])
+
+                if owned:
+                    state["owner"] = absolute(tokens.pop(0))
+
+                if state["owner"] is None:
+                    raise ValueError("the first record has no owner name")
+
+                ttl = state["ttl"]
+
+                while tokens and (tokens[0].upper() in self.zone_classes or tokens[0][:1].isdigit()):
+                    field = tokens.pop(0)
+                    if field.upper() not in self.zone_classes:
+                        ttl = self.zone_seconds(field)
+
+                (type, data) = (tokens[0].upper(), tokens[1:])
+
+                if type == "SOA":
+                    yield (number, None, None)
+                    continue
+
+                attribs = {"type": type, "name": relative(state["owner"])}
+
+                if type in ["A", "AAAA"]:
+                    attribs["data"] = data[0]
+                elif type in ["CNAME", "NS"]:
+                    attribs["data"] = target(data[0])
+                elif type == "MX":
+                    attribs.update(priority=int(data[0]), data=target(data[1]))
+                elif type == "SRV":
+                    attribs.update(
+                        priority=int(data[0]), weight=int(data[1]), port=int(data[2]), data=target(data[3])
+                    )
+                elif type == "TXT":
+                    attribs["data"] = "".join([self.zone_text(text) for text in [data[0]] + data[1:]])
+                elif type == "CAA":
+                    attribs.update(flags=int(data[0]), tag=data[1], data=self.zone_text(data[2]))
+                else:
+                    raise ValueError("%s records aren't supported" % type)
+
+                if ttl is not None:
+                    attribs["ttl"] = ttl
+
+                yield (number, attribs, None)
+
+            except ValueError as exception:
+                yield (number, None, "line %s: %s" % (number, exception))
+            except IndexError:
+                yield (number, None, "line %s: missing fields" % number)
+
+    def zone_line(self, record):
+        """
+        A record as a zone file line
+        """
+
+        data = record["data"]
+
+        if record["type"] in ["CNAME", "NS", "MX", "SRV"] and data != "@" and \
+           "." in data and not data.endswith("."):
+            data = "%s." % data
+
+        if record["type"] == "MX":
+            data = "%s %s" % (record["priority"], data)
+        elif record["type"] == "SRV":
+            data = "%s %s %s %s" % (record["priority"], record["weight"], record["port"], data)
+        elif record["type"] == "TXT":
+            data = " ".join([
+                '"%s"' % data[start:start + 255].replace("\\", "\\\\").replace('"', '\\"')
+                for start in range(0, max(len(data), 1), 255)
+            ])
+        elif record["type"] == "CAA":
+            data = '%s %s "%s"' % (record["flags"], record["tag"], data)
+
+        fields = [record["name"]]
+
+        if record.get("ttl") is not None:
+            fields.append(str(record["ttl"]))
+
+        return "%s\n" % " ".join(fields + ["IN", record["type"], data])
+
+    @invalidate("domain")
+    @require("name")
+    @require("path")
+    def zone_import(self):
+        """
+        Creates the records of a zone file not already in the domain, checking the whole file
+        first, then reading it again as a stream, zone_batch records at a time, max_in_flight
+        at once
+        """
+
+        path = self.module.params["path"]
+
+        try:
+            with open(path, "r") as zone:
+                errors = [error for (_, _, error) in self.zone_records(zone) if error is not None]
+        except (IOError, OSError) as exception:
+            self.module.fail_json(msg="unable to read %s: %s" % (path, exception))
+
+        if errors:
+            self.module.fail_json(
+                msg="%s lines of %s can't be imported" % (len(errors), path), errors=errors[:self.zone_batch]
+            )
+
+        existing = set()
+
+        for page in self.paged("domain", "domains/%s/records" % self.module.params["name"], "domain_records"):
+            for record in page:
+                existing.add(self.record_key(record))
+
+        counts = {"created": 0, "existing": 0, "skipped": 0}
+        failures = []
+
+        def create(entry):
+
+            (number, attribs) = entry
+            (_, failure) = self.attempt(self.do.domain.record_create, self.module.params["name"], attribs)
+
+            if failure is not None:
+                failure["line"] = number
+
+            return failure
+
+        def push(batch):
+            for failure in self.concurrently(create, batch):
+                if failure is None:
+                    counts["created"] += 1
+                else:
+                    failures.append(failure)
+
+        batch = []
+
+        with open(path, "r") as zone:
+
+            for (number, attribs, _) in self.zone_records(zone):
+
+                if attribs is None:
+                    counts["skipped"] += 1
+                    continue
+
+                key = self.record_key(attribs)
+
+                if key in existing:
+                    counts["existing"] += 1
+                    continue
+
+                existing.add(key)
+                batch.append((number, attribs))
+
+                if len(batch) >= self.zone_batch:
+                    push(batch)
+                    batch = []
+
+        push(batch)
+
+        if failures:
+            self.module.fail_json(
+                msg="%s of %s records failed to import" % (len(failures), len(failures) + counts["created"]),
+                changed=counts["created"] > 0, failures=failures[:self.zone_batch], **counts
+            )
+
+        self.module.exit_json(changed=counts["created"] > 0, **counts)
+
+    @require("name")
+    @require("path")
+    def zone_export(self):
+        """
+        Writes the domain's records to a zone file as each page of them arrives, replacing the
+        file only if it changed
+        """
+
+        path = os.path.abspath(self.module.params["path"])
+        digest = hashlib.sha256()
+        records = 0
+
+        try:
+            (handle, temp) = tempfile.mkstemp(dir=os.path.dirname(path))
+        except (IOError, OSError) as exception:
+            self.module.fail_json(msg="unable to write %s: %s" % (path, exception))
+
+        try:
+
+            with os.fdopen(handle, "w") as zone:
+
+                def write(text):
+                    zone.write(text)
+                    digest.update(text.encode("utf-8"))
+
+                write("$ORIGIN %s.\n" % self.module.params["name"].rstrip("."))
+
+                for page in self.paged(
+                    "domain", "domains/%s/records" % self.module.params["name"], "domain_records"
+                ):
+                    for record in page:
+                        if record["type"] != "SOA":
+                            write(self.zone_line(record))
+                            records += 1
+
+            current = None
+
+            if os.path.exists(path):
+                current = hashlib.sha256()
+                with open(path, "rb") as existing:
+                    for chunk in iter(lambda: existing.read(65536), b""):
+                        current.update(chunk)
+                os.chmod(temp, stat.S_IMODE(os.stat(path).st_mode))
+            else:
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(temp, 0o666 & ~umask)
+
+            changed = current is None or current.hexdigest() != digest.hexdigest()
+
+            if changed:
+                os.rename(temp, path)
+
+        except (IOError, OSError) as exception:
+            self.module.fail_json(msg="unable to write %s: %s" % (path, exception))
+
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+        self.module.exit_json(changed=changed, records=records)
 
 
 if __name__ == '__main__':
@@ -4,7 +4,7 @@
 import time
 import copy
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.doboto_module import require, DOBOTOModule
+from ansible.module_utils.doboto_module import require, invalidate, DOBOTOModule
 
 """
 Ansible module to manage DigitalOcean droplets
@@ -44,6 +44,7 @@ options:
             - droplet_neighbor_list
             - create
             - present
+            - exact
             - info
             - destroy
             - backup_list
@@ -73,7 +74,11 @@ options:
     name:
         description: same as DO API variable (for single create)
     names:
-        description: same as DO API variable (for mass create)
+        description: same as DO API variable (for mass create, any number split into requests of 10 run concurrently)
+    count:
+        description: number of droplets for mass create, named from name_template
+    name_template:
+        description: name of each of count droplets, % formatted with its number from 1, like worker-%03d
     region:
         description: same as DO API variable
     size:
@@ -101,19 +106,41 @@ options:
     tags:
         description: same as DO API variable (if single value, converted to array)
     tag_name:
-        description: same as DO API variable (for tag ID)
+        description: same as DO API variable (for tag ID, and the droplets exact manages)
+    ids:
+        description: droplet ids to run the action on (all but restore and rename), max_in_flight at once with one wait for all, or batch_size at a time
+    batch_size:
+        description: droplets to run an action on at once with ids or tag_name, waiting for each batch before the next (default all at once)
+    max_failures:
+        description: droplets that can fail with ids or tag_name batches before the rest are skipped and the task fails (default 0)
     snapshot_name:
         description: name of the snapshot
     wait:
         description: wait until tasks has completed before continuing
     poll:
-        description: poll value to check while waiting (default 5 seconds)
+        description: poll value to check while waiting, the most between checks with backoff (default 5 seconds)
     timeout:
         description: timeout value to give up after waiting (default 300 seconds)
+    poll_strategy:
+        description: fixed to check every poll seconds, or backoff to start at a second and double with jitter up to poll (default backoff)
     action_id:
         description: same as DO API variable (action id)
     url:
-        description: URL to use if not official (for experimenting)
+        description: URL to use if not official (for experimenting, uses DO_API_URL from ENV if not found)
+    transport:
+        description: direct, or broker to share a warm keep-alive client across runs (uses DOBOTO_TRANSPORT from ENV if not found, default direct)
+    rate_limit:
+        description: pace API calls across all processes using this token and report the calls made, how many waited and for how long (uses DOBOTO_RATE_LIMIT from ENV if not found)
+    stats:
+        description: return _doboto_stats with per endpoint call counts, bytes received, API time and time sleeping in polls and retries (uses DOBOTO_STATS from ENV if not found)
+    fields:
+        description: dotted paths of the fields to keep in each resource returned, like id or networks.v4.ip_address
+    query:
+        description: JMESPath expression to apply to what's returned before fields (requires jmespath)
+    batch:
+        description: list of items, each overriding options for one run of the action, run concurrently with results in the same order
+    max_in_flight:
+        description: most API operations to run at once within this run (default 10)
     extra:
         description: key / value of extra values to send (for experimenting)
 
@@ -245,8 +272,48 @@ EXAMPLES = '''
 '''
 
 
+def ready(droplet, attribs):
+    """
+    Determines if a droplet is ready the way DOBOTO does, without a call through the client
+    """
+
+    if droplet["status"] == "new":
+        return False
+
+    if attribs.get("private_networking") and not any(
+        [v4["type"] == "private" for v4 in droplet["networks"]["v4"]]
+    ):
+        return False
+
+    if attribs.get("ipv6") and "v6" not in droplet["networks"]:
+        return False
+
+    if attribs.get("tags") and len(attribs["tags"]) != len(droplet["tags"]):
+        return False
+
+    return True
+
+
 class Droplet(DOBOTOModule):
 
+    names_max = 10
+    rolling_actions = [
+        "backup_enable",
+        "backup_disable",
+        "reboot",
+        "shutdown",
+        "power_on",
+        "power_off",
+        "power_cycle",
+        "password_reset",
+        "resize",
+        "rebuild",
+        "kernel_update",
+        "ipv6_enable",
+        "private_networking_enable",
+        "snapshot_create"
+    ]
+
     def input(self):
 
         return AnsibleModule(argument_spec=dict(
@@ -256,6 +323,7 @@ class Droplet(DOBOTOModule):
                 "droplet_neighbor_list",
                 "create",
                 "present",
+                "exact",
                 "info",
                 "destroy",
                 "backup_list",
@@ -284,6 +352,8 @@ class Droplet(DOBOTOModule):
             id=dict(default=None),
             name=dict(default=None),
             names=dict(default=None, type='list'),
+            count=dict(default=None, type='int'),
+            name_template=dict(default=None),
             region=dict(default=None),
             size=dict(default=None),
             disk=dict(default=None, type='bool'),
@@ -298,11 +368,22 @@ class Droplet(DOBOTOModule):
             volume=dict(default=None, type='list'),
             tags=dict(type='list'),
             tag_name=dict(default=None),
+            ids=dict(default=None, type='list'),
+            batch_size=dict(default=None, type='int'),
+            max_failures=dict(default=0, type='int'),
             snapshot_name=dict(default=None),
             wait=dict(default=False, type='bool'),
             poll=dict(default=5, type='int'),
             timeout=dict(default=300, type='int'),
+            poll_strategy=dict(default=None, choices=["fixed", "backoff"]),
             action_id=dict(default=None),
+            transport=dict(default=None, choices=["direct", "broker"]),
+            rate_limit=dict(default=None, type='bool'),
+            stats=dict(default=None, type='bool'),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            batch=dict(default=None, type='list'),
+            max_in_flight=dict(default=None, type='int'),
             url=dict(default=self.url),
             extra=dict(default=None, type='dict'),
         ))
@@ -376,7 +457,68 @@ class Droplet(DOBOTOModule):
 
         return attribs
 
-    @require("name", "names")
+    def names(self):
+        """
+        Names for mass create, either names or count numbered from name_template
+        """
+
+        if self.module.params["names"] is not None:
+            return self.module.params["names"]
+
+        if self.module.params["count"] < 1:
+            self.module.fail_json(msg="the count parameter must be at least 1")
+
+        if self.module.params["name_template"] is None:
+            self.module.fail_json(msg="the name_template parameter is required with count")
+
+        try:
+            return [
+                self.module.params["name_template"] % number
+                for number in range(1, self.module.params["count"] + 1)
+            ]
+        except (TypeError, ValueError):
+            self.module.fail_json(msg="the name_template must format a number, like worker-%03d")
+
+    def create_names(self, attribs, names):
+        """
+        Creates droplets for names, names_max per request, max_in_flight requests at a time,
+        returning those created and the failures of any requests that didn't go through, even
+        those that couldn't be made or whose error wasn't JSON
+        """
+
+        chunks = [names[start:start + self.names_max] for start in range(0, len(names), self.names_max)]
+
+        created = []
+        failures = []
+
+        for (chunk, (droplets, failure)) in zip(chunks, self.concurrently(
+            lambda chunk: self.attempt_transient(self.do.droplet.create, dict(attribs, names=chunk)), chunks
+        )):
+            if failure is not None:
+                failure["names"] = chunk
+                failures.append(failure)
+            else:
+                created.extend(droplets)
+
+        return (created, failures)
+
+    def create_all(self, attribs, names):
+        """
+        Creates droplets for names, failing with those that were created if any request failed
+        """
+
+        (created, failures) = self.create_names(attribs, names)
+
+        if failures:
+            self.module.fail_json(
+                msg="%s of %s droplets failed to create" % (len(names) - len(created), len(names)),
+                created=created, failures=failures
+            )
+
+        return created
+
+    @invalidate("volume", when="volume")
+    @require("name", "names", "count")
     @require("region")
     @require("size")
     @require("image")
@@ -387,92 +529,335 @@ class Droplet(DOBOTOModule):
         if self.module.params["name"] is not None:
 
             attribs["name"] = self.module.params["name"]
-            droplet = self.do.droplet.create(
-                attribs,
-                self.module.params["wait"],
-                self.module.params["poll"],
-                self.module.params["timeout"]
-            )
+            droplet = self.droplets_result([self.do.droplet.create(attribs)], attribs)[0]
             self.module.exit_json(changed=True, droplet=droplet)
 
-        elif self.module.params["names"] is not None:
+        else:
 
-            attribs["names"] = self.module.params["names"]
-            droplets = self.do.droplet.create(
-                attribs,
-                self.module.params["wait"],
-                self.module.params["poll"],
-                self.module.params["timeout"]
-            )
+            droplets = self.droplets_result(self.create_all(attribs, self.names()), attribs)
             self.module.exit_json(changed=True, droplets=droplets)
 
-    @require("name", "names")
+    @invalidate("volume", when="volume")
+    @require("name", "names", "count")
     @require("region")
     @require("size")
     @require("image")
     def present(self):
 
         attribs = self.attribs()
+        named = self.named()
 
         if self.module.params["name"] is not None:
 
+            droplet = named.get(self.module.params["name"])
+
+            if droplet is not None:
+                self.module.exit_json(changed=False, droplet=droplet, created=None)
+
             attribs["name"] = self.module.params["name"]
-            (droplet, created) = self.do.droplet.present(
-                attribs,
-                wait=self.module.params["wait"],
-                poll=self.module.params["poll"],
-                timeout=self.module.params["timeout"]
-            )
-            self.module.exit_json(changed=(created is not None), droplet=droplet, created=created)
+            droplet = self.droplets_result([self.do.droplet.create(attribs)], attribs)[0]
 
-        elif self.module.params["names"] is not None:
+            self.module.exit_json(changed=True, droplet=droplet, created=droplet)
+
+        else:
+
+            names = self.names()
+            missing = []
+
+            for name in names:
+                if name not in named:
+                    named[name] = None
+                    missing.append(name)
+
+            created = []
+
+            if missing:
+                created = self.droplets_result(self.create_all(attribs, missing), attribs)
+
+            for droplet in created:
+                named[droplet["name"]] = droplet
+
+            droplets = [named[name] for name in names]
 
-            attribs["names"] = self.module.params["names"]
-            (droplets, created) = self.do.droplet.present(
-                attribs,
-                wait=self.module.params["wait"],
-                poll=self.module.params["poll"],
-                timeout=self.module.params["timeout"]
-            )
             self.module.exit_json(changed=(len(created) > 0), droplets=droplets, created=created)
 
+    def named(self):
+        """
+        Indexes all droplets by name from one listing, keeping the first of any duplicates
+        """
+
+        named = {}
+
+        for droplet in self.do.droplet.list():
+            named.setdefault(droplet["name"], droplet)
+
+        return named
+
+    def droplets_result(self, droplets, attribs):
+        """
+        Waits for created droplets to be ready if asked to, watching their create actions in
+        the action feed and only checking on a droplet once it's created
+        """
+
+        if not self.module.params["wait"]:
+            return droplets
+
+        def refresh(droplets):
+
+            pending = [
+                index for (index, droplet) in enumerate(droplets)
+                if not ready(droplet, attribs)
+            ]
+
+            if len(pending) > 1:
+
+                found = self.feed(
+                    [("create", "droplet", droplets[index]["id"]) for index in pending],
+                    lambda action: (action["type"], action["resource_type"], action["resource_id"])
+                )
+
+                pending = [
+                    index for index in pending
+                    if found.get(("create", "droplet", droplets[index]["id"]), {}).get("status") != "in-progress"
+                ]
+
+            for (index, droplet) in zip(pending, self.concurrently(
+                lambda index: self.do.droplet.info(droplets[index]["id"]), pending
+            )):
+                droplets[index] = droplet
+
+            return droplets
+
+        return self.wait_for(
+            droplets,
+            refresh,
+            lambda droplets: all([ready(droplet, attribs) for droplet in droplets])
+        )
+
+    @invalidate("image", "volume")
+    @require("tag_name")
+    @require("names", "count")
+    @require("region")
+    @require("size")
+    @require("image")
+    def exact(self):
+        """
+        Makes the droplets tagged tag_name exactly names (or count from name_template) from one
+        listing, creating those missing, destroying the rest and resizing those of another size
+        """
+
+        attribs = self.attribs()
+        attribs["tags"] = list(attribs["tags"] or [])
+
+        if self.module.params["tag_name"] not in attribs["tags"]:
+            attribs["tags"].append(self.module.params["tag_name"])
+
+        names = self.names()
+        wanted = set(names)
+        named = {}
+        extras = []
+
+        for droplet in self.do.droplet.list(tag_name=self.module.params["tag_name"]):
+            if droplet["name"] in wanted and droplet["name"] not in named:
+                named[droplet["name"]] = droplet
+            else:
+                extras.append(droplet)
+
+        missing = []
+
+        for name in names:
+            if name not in named:
+                named[name] = None
+                missing.append(name)
+
+        drifted = [
+            droplet for droplet in named.values()
+            if droplet is not None and droplet["size_slug"] != self.module.params["size"]
+        ]
+
+        failures = []
+
+        def each(droplets, start):
+            """
+            Starts an action on each droplet, returning those it failed for
+            """
+
+            done = []
+
+            for (droplet, (result, failure)) in zip(droplets, self.concurrently(
+                lambda droplet: self.attempt(start, droplet["id"]), droplets
+            )):
+                if failure is not None:
+                    failure["id"] = droplet["id"]
+                    failures.append(failure)
+                else:
+                    done.append((droplet, result))
+
+            return done
+
+        def steps(droplets, start):
+            """
+            Runs an action on each droplet and waits for all, returning those it worked for
+            """
+
+            started = each(droplets, start)
+            actions = self.actions_wait([action for (droplet, action) in started])
+            done = []
+
+            for ((droplet, _), action) in zip(started, actions):
+                if action["status"] == "errored":
+                    failures.append({"id": droplet["id"], "msg": "%s errored" % action["type"]})
+                else:
+                    done.append(droplet)
+
+            return done
+
+        created = []
+
+        if missing:
+            (created, creating) = self.create_names(attribs, missing)
+            failures.extend(creating)
+
+        destroyed = [droplet for (droplet, _) in each(extras, lambda id: self.do.droplet.destroy(id=id))]
+
+        off = steps(
+            [droplet for droplet in drifted if droplet["status"] == "active"],
+            lambda id: self.do.droplet.power_off(id=id)
+        )
+        resized = steps(
+            [droplet for droplet in drifted if droplet["status"] != "active" or droplet in off],
+            lambda id: self.do.droplet.resize(id, self.module.params["size"], bool(self.module.params["disk"]))
+        )
+        steps(off, lambda id: self.do.droplet.power_on(id=id))
+
+        resized = self.concurrently(lambda droplet: self.do.droplet.info(droplet["id"]), resized)
+
+        for droplet in resized:
+            named[droplet["name"]] = droplet
+
+        for droplet in self.droplets_result(created, attribs):
+            named[droplet["name"]] = droplet
+
+        result = {
+            "changed": len(created + destroyed + resized) > 0,
+            "droplets": [named[name] for name in names if named[name] is not None],
+            "created": created,
+            "destroyed": destroyed,
+            "resized": resized
+        }
+
+        if failures:
+            self.module.fail_json(msg="%s droplet changes failed" % len(failures), failures=failures, **result)
+
+        self.module.exit_json(**result)
+
     @require("id")
     def info(self):
         self.module.exit_json(changed=False, droplet=self.do.droplet.info(
             self.module.params["id"]
         ))
 
+    @invalidate("image", "volume")
     @require("id", "tag_name")
     def destroy(self):
         self.module.exit_json(changed=True, result=self.do.droplet.destroy(
             id=self.module.params["id"], tag_name=self.module.params["tag_name"]
         ))
 
+    def rolls(self):
+        """
+        Whether to run the action over droplets in batches
+        """
+
+        return self.module.params["ids"] is not None or (
+            self.module.params["tag_name"] is not None and self.module.params["batch_size"] is not None
+        )
+
+    def rolling(self, start):
+        """
+        Starts an action on each of ids (or the droplets tagged) batch_size at a time, max_in_flight
+        at once, waiting on each batch before the next and skipping the rest past max_failures
+        """
+
+        if self.module.params["action"] not in self.rolling_actions:
+            self.module.fail_json(msg="ids and batch_size can't be used with %s" % self.module.params["action"])
+
+        ids = self.module.params["ids"]
+
+        if ids is None:
+            ids = [droplet["id"] for droplet in self.do.droplet.list(tag_name=self.module.params["tag_name"])]
+
+        batch_size = max(self.module.params["batch_size"] or len(ids), 1)
+
+        def begin(id):
+
+            (action, failure) = self.attempt(start, id)
+
+            if failure is not None:
+                failure.update(id=id, failed=True)
+                return failure
+
+            return {"id": id, "action": action}
+
+        results = []
+        failures = 0
+
+        for offset in range(0, len(ids), batch_size):
+
+            if failures > self.module.params["max_failures"]:
+                results.extend([{"id": id, "skipped": True} for id in ids[offset:offset + batch_size]])
+                continue
+
+            batch = self.concurrently(begin, ids[offset:offset + batch_size])
+            started = [result for result in batch if "action" in result]
+            actions = [result["action"] for result in started]
+
+            if self.module.params["wait"] or offset + batch_size < len(ids):
+                actions = self.actions_wait(actions)
+            else:
+                self.unfinished(actions)
+
+            for (result, action) in zip(started, actions):
+                result["action"] = action
+                if action["status"] == "errored":
+                    result.update(failed=True, msg="action errored")
+
+            failures += len([result for result in batch if result.get("failed")])
+            results.extend(batch)
+
+        actions = [result["action"] for result in results if "action" in result]
+
+        if failures > self.module.params["max_failures"]:
+            self.module.fail_json(
+                msg="%s of %s droplets failed" % (failures, len(ids)),
+                changed=len(actions) > 0, actions=actions, results=results
+            )
+
+        self.module.exit_json(changed=len(actions) > 0, actions=actions, results=results)
+
     def action(self, tagless=False):
 
-        if self.module.params["id"] is not None:
+        if self.module.params["id"] is None and self.rolls():
+
+            self.rolling(lambda id: getattr(self.do.droplet, self.module.params["action"])(id=id))
 
-            self.module.exit_json(changed=True, action=getattr(
+        elif self.module.params["id"] is not None:
+
+            self.module.exit_json(changed=True, action=self.action_result(getattr(
                 self.do.droplet,
                 self.module.params["action"]
             )(
-                id=self.module.params["id"],
-                wait=self.module.params["wait"],
-                poll=self.module.params["poll"],
-                timeout=self.module.params["timeout"]
-            ))
+                id=self.module.params["id"]
+            )))
 
         elif not tagless and self.module.params["tag_name"] is not None:
 
-            self.module.exit_json(changed=True, actions=getattr(
+            self.module.exit_json(changed=True, actions=self.actions_result(getattr(
                 self.do.droplet,
                 self.module.params["action"]
             )(
-                tag_name=self.module.params["tag_name"],
-                wait=self.module.params["wait"],
-                poll=self.module.params["poll"],
-                timeout=self.module.params["timeout"]
-            ))
+                tag_name=self.module.params["tag_name"]
+            )))
 
         else:
 
@@ -481,64 +866,74 @@ class Droplet(DOBOTOModule):
     @require("id")
     @require("image")
     def restore(self):
-        self.module.exit_json(changed=True, action=self.do.droplet.restore(
-            self.module.params["id"], self.module.params["image"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.module.exit_json(changed=True, action=self.action_result(self.do.droplet.restore(
+            self.module.params["id"], self.module.params["image"]
+        )))
 
-    @require("id")
+    @require("id", "ids", "tag_name")
     @require("size")
     def resize(self):
-        self.module.exit_json(changed=True, action=self.do.droplet.resize(
-            self.module.params["id"], self.module.params["size"], self.module.params["disk"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
 
-    @require("id")
+        if self.module.params["id"] is None:
+            self.rolling(lambda id: self.do.droplet.resize(
+                id, self.module.params["size"], bool(self.module.params["disk"])
+            ))
+
+        self.module.exit_json(changed=True, action=self.action_result(self.do.droplet.resize(
+            self.module.params["id"], self.module.params["size"], bool(self.module.params["disk"])
+        )))
+
+    @require("id", "ids", "tag_name")
     @require("image")
     def rebuild(self):
-        self.module.exit_json(changed=True, action=self.do.droplet.rebuild(
-            self.module.params["id"], self.module.params["image"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+
+        if self.module.params["id"] is None:
+            self.rolling(lambda id: self.do.droplet.rebuild(id, self.module.params["image"]))
+
+        self.module.exit_json(changed=True, action=self.action_result(self.do.droplet.rebuild(
+            self.module.params["id"], self.module.params["image"]
+        )))
 
     @require("id")
     @require("name")
     def rename(self):
-        self.module.exit_json(changed=True, action=self.do.droplet.rename(
-            self.module.params["id"], self.module.params["name"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.module.exit_json(changed=True, action=self.action_result(self.do.droplet.rename(
+            self.module.params["id"], self.module.params["name"]
+        )))
 
-    @require("id")
+    @require("id", "ids", "tag_name")
     @require("kernel")
     def kernel_update(self):
-        self.module.exit_json(changed=True, action=self.do.droplet.kernel_update(
-            self.module.params["id"], self.module.params["kernel"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
 
-    @require("id", "tag_name")
+        if self.module.params["id"] is None:
+            self.rolling(lambda id: self.do.droplet.kernel_update(id, self.module.params["kernel"]))
+
+        self.module.exit_json(changed=True, action=self.action_result(self.do.droplet.kernel_update(
+            self.module.params["id"], self.module.params["kernel"]
+        )))
+
+    @invalidate("image")
+    @require("id", "ids", "tag_name")
     @require("snapshot_name")
     def snapshot_create(self):
-        self.module.exit_json(changed=True, action=self.do.droplet.snapshot_create(
+
+        if self.module.params["id"] is None and self.rolls():
+            self.rolling(lambda id: self.do.droplet.snapshot_create(
+                id=id, snapshot_name=self.module.params["snapshot_name"]
+            ))
+
+        action = self.do.droplet.snapshot_create(
             id=self.module.params["id"],
             tag_name=self.module.params["tag_name"],
-            snapshot_name=self.module.params["snapshot_name"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+            snapshot_name=self.module.params["snapshot_name"]
+        )
+
+        if isinstance(action, list):
+            action = self.actions_result(action)
+        else:
+            action = self.action_result(action)
+
+        self.module.exit_json(changed=True, action=action)
 
     @require("id")
     @require("action_id")
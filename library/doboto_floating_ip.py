@@ -1,7 +1,6 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-import time
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.doboto_module import require, DOBOTOModule
 
@@ -55,21 +54,51 @@ options:
     droplet_id:
         description:
             - same as DO API variable
+    droplet_ids:
+        description:
+            - with create, reserve a floating IP for each of these droplets, concurrently
+    count:
+        description:
+            - with create, reserve this many (at least 1) floating IPs in region, concurrently, instead of droplet_ids
     wait:
         description:
             - wait until tasks has completed before continuing
     poll:
         description:
-            - poll value to check while waiting (default 5 seconds)
+            - poll value to check while waiting, the most between checks with backoff (default 5 seconds)
     timeout:
         description:
             - timeout value to give up after waiting (default 300 seconds)
+    poll_strategy:
+        description:
+            - fixed to check every poll seconds, or backoff to start at a second and double with jitter up to poll (default backoff)
     action_id:
         description:
             - same as DO API variable (action id)
     url:
         description:
-            - URL to use if not official (for experimenting)
+            - URL to use if not official (for experimenting, uses DO_API_URL from ENV if not found)
+    transport:
+        description:
+            - direct, or broker to share a warm keep-alive client across runs (uses DOBOTO_TRANSPORT from ENV if not found, default direct)
+    rate_limit:
+        description:
+            - pace API calls across all processes using this token and report the calls made, how many waited and for how long (uses DOBOTO_RATE_LIMIT from ENV if not found)
+    stats:
+        description:
+            - return _doboto_stats with per endpoint call counts, bytes received, API time and time sleeping in polls and retries (uses DOBOTO_STATS from ENV if not found)
+    fields:
+        description:
+            - dotted paths of the fields to keep in each resource returned, like id or networks.v4.ip_address
+    query:
+        description:
+            - JMESPath expression to apply to what's returned before fields (requires jmespath)
+    batch:
+        description:
+            - list of items, each overriding options for one run of the action, run concurrently with results in the same order
+    max_in_flight:
+        description:
+            - most API operations to run at once within this run (default 10)
 '''
 
 EXAMPLES = '''
@@ -97,6 +126,13 @@ EXAMPLES = '''
     wait: true
   register: floating_ip_create_region
 
+- name: floating_ip | create | pool
+  doboto_floating_ip:
+    action: create
+    region: nyc1
+    count: 5
+  register: floating_ip_create_pool
+
 - name: floating_ip | list
   doboto_floating_ip:
     action: list
@@ -174,41 +210,133 @@ class FloatingIP(DOBOTOModule):
             ip=dict(default=None),
             region=dict(default=None),
             droplet_id=dict(default=None),
+            droplet_ids=dict(default=None, type='list'),
+            count=dict(default=None, type='int'),
             wait=dict(default=False, type='bool'),
             poll=dict(default=5, type='int'),
             timeout=dict(default=300, type='int'),
+            poll_strategy=dict(default=None, choices=["fixed", "backoff"]),
             action_id=dict(default=None),
+            transport=dict(default=None, choices=["direct", "broker"]),
+            rate_limit=dict(default=None, type='bool'),
+            stats=dict(default=None, type='bool'),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            batch=dict(default=None, type='list'),
+            max_in_flight=dict(default=None, type='int'),
             url=dict(default=self.url)
         ))
 
     def list(self):
         self.module.exit_json(changed=False, floating_ips=self.do.floating_ip.list())
 
-    @require("droplet_id", "region")
+    @require("droplet_id", "droplet_ids", "region")
     def create(self):
 
+        if self.module.params["droplet_ids"] is not None or self.module.params["count"] is not None:
+            self.pool()
+
         floating_ip = self.do.floating_ip.create(
             droplet_id=self.module.params["droplet_id"],
             region=self.module.params["region"]
         )
 
-        start_time = time.time()
+        if self.module.params["wait"]:
+            (floating_ip,) = self.assigned([floating_ip], [self.module.params["droplet_id"]])
 
-        while self.module.params["wait"] and \
-              (self.module.params["droplet_id"] is None or floating_ip["droplet"]) is None and \
-              (self.module.params["region"] is None or floating_ip["region"] is None):
+        self.module.exit_json(changed=True, floating_ip=floating_ip)
 
-            time.sleep(self.module.params["poll"])
+    def assigned(self, floating_ips, droplet_ids):
+        """
+        Waits for floating IPs created for droplets (droplet_ids in the same order, None for those
+        only reserved) to be assigned, refreshing one by info or many from one list each time
+        """
 
-            try:
-                floating_ip = self.do.floating_ip.info(floating_ip["ip"])
-            except:
-                pass
+        def waiting(floating_ips):
+            return [
+                floating_ip["ip"] for (floating_ip, droplet_id) in zip(floating_ips, droplet_ids)
+                if droplet_id is not None and floating_ip["droplet"] is None
+            ]
 
-            if time.time() - start_time > self.module.params["timeout"]:
-                self.module.fail_json(msg="Timeout on polling", floating_ip=floating_ip)
+        def refresh(floating_ips):
 
-        self.module.exit_json(changed=True, floating_ip=floating_ip)
+            ips = waiting(floating_ips)
+
+            if len(ips) == 1:
+                found = {ips[0]: self.do.floating_ip.info(ips[0])}
+            else:
+                found = dict([(floating_ip["ip"], floating_ip) for floating_ip in self.do.floating_ip.list()])
+
+            return [found.get(floating_ip["ip"], floating_ip) for floating_ip in floating_ips]
+
+        return self.wait_for(
+            floating_ips, refresh, lambda floating_ips: not waiting(floating_ips), missing_only=True
+        )
+
+    def pool(self):
+        """
+        Reserves count floating IPs in region, or one for each of droplet_ids, concurrently,
+        waiting for them all together if asked to, failing with all those reserved if any
+        failed to reserve or weren't assigned in time
+        """
+
+        if self.module.params["droplet_ids"] is not None:
+            if self.module.params["count"] is not None:
+                self.module.fail_json(msg="the droplet_ids and count parameters are mutually exclusive")
+            droplet_ids = self.module.params["droplet_ids"]
+        elif self.module.params["count"] < 1:
+            self.module.fail_json(msg="the count parameter must be at least 1")
+        elif self.module.params["region"] is not None:
+            droplet_ids = [None] * self.module.params["count"]
+        else:
+            self.module.fail_json(msg="the region parameter is required with count")
+
+        def reserve(droplet_id):
+
+            (floating_ip, failure) = self.attempt(
+                self.do.floating_ip.create,
+                droplet_id=droplet_id, region=None if droplet_id is not None else self.module.params["region"]
+            )
+
+            result = {"droplet_id": droplet_id}
+
+            if failure is not None:
+                result.update(failed=True, **failure)
+            else:
+                result["floating_ip"] = floating_ip
+
+            return result
+
+        results = self.concurrently(reserve, droplet_ids)
+        reserved = [result for result in results if "floating_ip" in result]
+
+        floating_ips = [result["floating_ip"] for result in reserved]
+
+        if self.module.params["wait"] and reserved:
+
+            (assigned, failure) = self.attempt(
+                self.assigned, floating_ips, [result["droplet_id"] for result in reserved]
+            )
+
+            if failure is not None:
+                assigned = failure.get("polling") or floating_ips
+
+            for (result, floating_ip) in zip(reserved, assigned):
+                result["floating_ip"] = floating_ip
+                if failure is not None and result["droplet_id"] is not None and floating_ip["droplet"] is None:
+                    result.update(failed=True, msg=failure["msg"])
+
+            floating_ips = assigned
+
+        failures = len([result for result in results if result.get("failed")])
+
+        if failures:
+            self.module.fail_json(
+                msg="%s of %s floating IPs failed to reserve or assign" % (failures, len(results)),
+                changed=len(reserved) > 0, floating_ips=floating_ips, results=results
+            )
+
+        self.module.exit_json(changed=len(reserved) > 0, floating_ips=floating_ips)
 
     @require("ip")
     def info(self):
@@ -225,21 +353,16 @@ class FloatingIP(DOBOTOModule):
     @require("ip")
     @require("droplet_id")
     def assign(self):
-        self.module.exit_json(changed=True, action=self.do.floating_ip.assign(
+        self.module.exit_json(changed=True, action=self.action_result(self.do.floating_ip.assign(
             self.module.params["ip"], self.module.params["droplet_id"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+            wait=False, poll=None, timeout=None
+        )))
 
     @require("ip")
     def unassign(self):
-        self.module.exit_json(changed=True, action=self.do.floating_ip.unassign(
-            self.module.params["ip"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.module.exit_json(changed=True, action=self.action_result(self.do.floating_ip.unassign(
+            self.module.params["ip"], wait=False, poll=None, timeout=None
+        )))
 
     @require("ip")
     def action_list(self):
@@ -3,7 +3,7 @@
 
 import time
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.doboto_module import require, DOBOTOModule
+from ansible.module_utils.doboto_module import require, invalidate, DOBOTOModule
 
 """
 Ansible module to manage DigitalOcean images
@@ -61,13 +61,33 @@ options:
     wait:
         description: wait until tasks has completed before continuing
     poll:
-        description: poll value to check while waiting (default 5 seconds)
+        description: poll value to check while waiting, the most between checks with backoff (default 5 seconds)
     timeout:
         description: timeout value to give up after waiting (default 300 seconds)
+    poll_strategy:
+        description: fixed to check every poll seconds, or backoff to start at a second and double with jitter up to poll (default backoff)
     action_id:
         description: same as DO API variable (action id)
     url:
-        description: URL to use if not official (for experimenting)
+        description: URL to use if not official (for experimenting, uses DO_API_URL from ENV if not found)
+    transport:
+        description: direct, or broker to share a warm keep-alive client across runs (uses DOBOTO_TRANSPORT from ENV if not found, default direct)
+    rate_limit:
+        description: pace API calls across all processes using this token and report the calls made, how many waited and for how long (uses DOBOTO_RATE_LIMIT from ENV if not found)
+    stats:
+        description: return _doboto_stats with per endpoint call counts, bytes received, API time and time sleeping in polls and retries (uses DOBOTO_STATS from ENV if not found)
+    fields:
+        description: dotted paths of the fields to keep in each resource returned, like id or networks.v4.ip_address
+    query:
+        description: JMESPath expression to apply to what's returned before fields (requires jmespath)
+    batch:
+        description: list of items, each overriding options for one run of the action, run concurrently with results in the same order
+    max_in_flight:
+        description: most API operations to run at once within this run (default 10)
+    cache:
+        description: serve list and info results from an on disk cache (uses DOBOTO_CACHE_DIR from ENV, default ~/.ansible/tmp/doboto)
+    cache_ttl:
+        description: seconds a cached result is reused (default 3600 seconds)
 
 '''
 
@@ -163,6 +183,8 @@ EXAMPLES = '''
 
 class Image(DOBOTOModule):
 
+    cache_ttl = 3600
+
     def input(self):
 
         return AnsibleModule(argument_spec=dict(
@@ -186,22 +208,34 @@ class Image(DOBOTOModule):
             wait=dict(default=False, type='bool'),
             poll=dict(default=5, type='int'),
             timeout=dict(default=300, type='int'),
+            poll_strategy=dict(default=None, choices=["fixed", "backoff"]),
             action_id=dict(default=None),
+            cache=dict(default=False, type='bool'),
+            cache_ttl=dict(default=None, type='int'),
+            transport=dict(default=None, choices=["direct", "broker"]),
+            rate_limit=dict(default=None, type='bool'),
+            stats=dict(default=None, type='bool'),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            batch=dict(default=None, type='list'),
+            max_in_flight=dict(default=None, type='int'),
             url=dict(default=self.url)
         ))
 
     def list(self):
-        self.module.exit_json(changed=False, images=self.do.image.list(
+        self.module.exit_json(changed=False, images=self.cached(
+            "image", "list",
             type=self.module.params["type"],
             private=('true' if self.module.params["private"] else 'false')
         ))
 
     @require("id", "slug")
     def info(self):
-        self.module.exit_json(changed=False, image=self.do.image.info(
-            self.module.params["id"] or self.module.params["slug"]
+        self.module.exit_json(changed=False, image=self.cached(
+            "image", "info", self.module.params["id"] or self.module.params["slug"]
         ))
 
+    @invalidate("image")
     @require("id")
     @require("name")
     def update(self):
@@ -209,30 +243,28 @@ class Image(DOBOTOModule):
             self.module.params["id"], self.module.params["name"]
         ))
 
+    @invalidate("image")
     @require("id")
     def destroy(self):
         self.module.exit_json(changed=True, result=self.do.image.destroy(
             self.module.params["id"]
         ))
 
+    @invalidate("image")
     @require("id")
     def convert(self):
-        self.module.exit_json(changed=True, action=self.do.image.convert(
-            self.module.params["id"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.module.exit_json(changed=True, action=self.action_result(self.do.image.convert(
+            self.module.params["id"], wait=False, poll=None, timeout=None
+        )))
 
+    @invalidate("image")
     @require("id")
     @require("region")
     def transfer(self):
-        self.module.exit_json(changed=True, action=self.do.image.transfer(
+        self.module.exit_json(changed=True, action=self.action_result(self.do.image.transfer(
             self.module.params["id"], self.module.params["region"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+            wait=False, poll=None, timeout=None
+        )))
 
     @require("id")
     def action_list(self):
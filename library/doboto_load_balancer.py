@@ -70,11 +70,27 @@ options:
     wait:
         description: wait until tasks has completed before continuing
     poll:
-        description: poll value to check while waiting (default 5 seconds)
+        description: poll value to check while waiting, the most between checks with backoff (default 5 seconds)
     timeout:
         description: timeout value to give up after waiting (default 300 seconds)
+    poll_strategy:
+        description: fixed to check every poll seconds, or backoff to start at a second and double with jitter up to poll (default backoff)
     url:
-        description: URL to use if not official (for experimenting)
+        description: URL to use if not official (for experimenting, uses DO_API_URL from ENV if not found)
+    transport:
+        description: direct, or broker to share a warm keep-alive client across runs (uses DOBOTO_TRANSPORT from ENV if not found, default direct)
+    rate_limit:
+        description: pace API calls across all processes using this token and report the calls made, how many waited and for how long (uses DOBOTO_RATE_LIMIT from ENV if not found)
+    stats:
+        description: return _doboto_stats with per endpoint call counts, bytes received, API time and time sleeping in polls and retries (uses DOBOTO_STATS from ENV if not found)
+    fields:
+        description: dotted paths of the fields to keep in each resource returned, like id or networks.v4.ip_address
+    query:
+        description: JMESPath expression to apply to what's returned before fields (requires jmespath)
+    batch:
+        description: list of items, each overriding options for one run of the action, run concurrently with results in the same order
+    max_in_flight:
+        description: most API operations to run at once within this run (default 10)
 '''
 
 EXAMPLES = '''
@@ -261,6 +277,14 @@ class LoadBalancer(DOBOTOModule):
             wait=dict(default=False, type='bool'),
             poll=dict(default=5, type='int'),
             timeout=dict(default=300, type='int'),
+            poll_strategy=dict(default=None, choices=["fixed", "backoff"]),
+            transport=dict(default=None, choices=["direct", "broker"]),
+            rate_limit=dict(default=None, type='bool'),
+            stats=dict(default=None, type='bool'),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            batch=dict(default=None, type='list'),
+            max_in_flight=dict(default=None, type='int'),
             url=dict(default=self.url)
         ))
 
@@ -291,11 +315,8 @@ class LoadBalancer(DOBOTOModule):
 
         attribs = self.attribs()
 
-        self.module.exit_json(changed=True, load_balancer=self.do.load_balancer.create(
-            attribs,
-            self.module.params["wait"],
-            self.module.params["poll"],
-            self.module.params["timeout"]
+        self.module.exit_json(changed=True, load_balancer=self.load_balancer_result(
+            self.do.load_balancer.create(attribs, False, None, None)
         ))
 
     @require("name")
@@ -305,16 +326,29 @@ class LoadBalancer(DOBOTOModule):
 
         attribs = self.attribs()
 
-        (load_balancer, created) = self.do.load_balancer.present(
-            attribs,
-            self.module.params["wait"],
-            self.module.params["poll"],
-            self.module.params["timeout"]
-        )
+        (load_balancer, created) = self.do.load_balancer.present(attribs, False, None, None)
+
+        if created is not None:
+            load_balancer = created = self.load_balancer_result(created)
+
         self.module.exit_json(
             changed=(created is not None), load_balancer=load_balancer, created=created
         )
 
+    def load_balancer_result(self, load_balancer):
+        """
+        Waits for a created load balancer to get its IP if asked to
+        """
+
+        if not self.module.params["wait"]:
+            return load_balancer
+
+        return self.wait_for(
+            load_balancer,
+            lambda load_balancer: self.do.load_balancer.info(load_balancer["id"]),
+            lambda load_balancer: load_balancer["ip"]
+        )
+
     @require("id")
     def info(self):
         self.module.exit_json(changed=False, load_balancer=self.do.load_balancer.info(
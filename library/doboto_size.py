@@ -39,7 +39,21 @@ options:
         choices:
             - list
     url:
-        description: URL to use if not official (for experimenting)
+        description: URL to use if not official (for experimenting, uses DO_API_URL from ENV if not found)
+    transport:
+        description: direct, or broker to share a warm keep-alive client across runs (uses DOBOTO_TRANSPORT from ENV if not found, default direct)
+    rate_limit:
+        description: pace API calls across all processes using this token and report the calls made, how many waited and for how long (uses DOBOTO_RATE_LIMIT from ENV if not found)
+    stats:
+        description: return _doboto_stats with per endpoint call counts, bytes received, API time and time sleeping in polls and retries (uses DOBOTO_STATS from ENV if not found)
+    fields:
+        description: dotted paths of the fields to keep in each resource returned, like id or networks.v4.ip_address
+    query:
+        description: JMESPath expression to apply to what's returned before fields (requires jmespath)
+    cache:
+        description: serve results from an on disk cache (uses DOBOTO_CACHE_DIR from ENV, default ~/.ansible/tmp/doboto)
+    cache_ttl:
+        description: seconds a cached result is reused (default 86400 seconds)
 '''
 
 EXAMPLES = '''
@@ -52,6 +66,8 @@ EXAMPLES = '''
 
 class Size(DOBOTOModule):
 
+    cache_ttl = 86400
+
     def input(self):
 
         return AnsibleModule(argument_spec=dict(
@@ -59,11 +75,18 @@ class Size(DOBOTOModule):
                 "list"
             ]),
             token=dict(default=None, no_log=True),
+            cache=dict(default=False, type='bool'),
+            cache_ttl=dict(default=None, type='int'),
+            transport=dict(default=None, choices=["direct", "broker"]),
+            rate_limit=dict(default=None, type='bool'),
+            stats=dict(default=None, type='bool'),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
             url=dict(default=self.url)
         ))
 
     def list(self):
-        self.module.exit_json(changed=False, sizes=self.do.size.list())
+        self.module.exit_json(changed=False, sizes=self.cached("size", "list"))
 
 
 if __name__ == '__main__':
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.doboto_module import require, DOBOTOModule
+from ansible.module_utils.doboto_module import require, invalidate, DOBOTOModule
 
 """
 Ansible module to manage DigitalOcean snapshots
@@ -45,7 +45,21 @@ options:
     resource_type:
         description: same as DO API variable
     url:
-        description: URL to use if not official (for experimenting)
+        description: URL to use if not official (for experimenting, uses DO_API_URL from ENV if not found)
+    transport:
+        description: direct, or broker to share a warm keep-alive client across runs (uses DOBOTO_TRANSPORT from ENV if not found, default direct)
+    rate_limit:
+        description: pace API calls across all processes using this token and report the calls made, how many waited and for how long (uses DOBOTO_RATE_LIMIT from ENV if not found)
+    stats:
+        description: return _doboto_stats with per endpoint call counts, bytes received, API time and time sleeping in polls and retries (uses DOBOTO_STATS from ENV if not found)
+    fields:
+        description: dotted paths of the fields to keep in each resource returned, like id or networks.v4.ip_address
+    query:
+        description: JMESPath expression to apply to what's returned before fields (requires jmespath)
+    batch:
+        description: list of items, each overriding options for one run of the action, run concurrently with results in the same order
+    max_in_flight:
+        description: most API operations to run at once within this run (default 10)
 
 '''
 
@@ -128,6 +142,13 @@ class Snapshot(DOBOTOModule):
             token=dict(default=None, no_log=True),
             id=dict(default=None),
             resource_type=dict(default=None),
+            transport=dict(default=None, choices=["direct", "broker"]),
+            rate_limit=dict(default=None, type='bool'),
+            stats=dict(default=None, type='bool'),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            batch=dict(default=None, type='list'),
+            max_in_flight=dict(default=None, type='int'),
             url=dict(default=self.url)
         ))
 
@@ -142,6 +163,7 @@ class Snapshot(DOBOTOModule):
             id=self.module.params["id"]
         ))
 
+    @invalidate("image")
     @require("id")
     def destroy(self):
         self.module.exit_json(changed=True, result=self.do.snapshot.destroy(
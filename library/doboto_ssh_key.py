@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.doboto_module import require, DOBOTOModule
+from ansible.module_utils.doboto_module import require, invalidate, DOBOTOModule
 
 """
 Ansible module to manage DigitalOcean ssh keys
@@ -52,7 +52,25 @@ options:
     fingerprint:
         description: same as DO API variable
     url:
-        description: URL to use if not official (for experimenting)
+        description: URL to use if not official (for experimenting, uses DO_API_URL from ENV if not found)
+    transport:
+        description: direct, or broker to share a warm keep-alive client across runs (uses DOBOTO_TRANSPORT from ENV if not found, default direct)
+    rate_limit:
+        description: pace API calls across all processes using this token and report the calls made, how many waited and for how long (uses DOBOTO_RATE_LIMIT from ENV if not found)
+    stats:
+        description: return _doboto_stats with per endpoint call counts, bytes received, API time and time sleeping in polls and retries (uses DOBOTO_STATS from ENV if not found)
+    fields:
+        description: dotted paths of the fields to keep in each resource returned, like id or networks.v4.ip_address
+    query:
+        description: JMESPath expression to apply to what's returned before fields (requires jmespath)
+    batch:
+        description: list of items, each overriding options for one run of the action, run concurrently with results in the same order
+    max_in_flight:
+        description: most API operations to run at once within this run (default 10)
+    cache:
+        description: serve list and info results from an on disk cache (uses DOBOTO_CACHE_DIR from ENV, default ~/.ansible/tmp/doboto)
+    cache_ttl:
+        description: seconds a cached result is reused (default 300 seconds)
 '''
 
 EXAMPLES = '''
@@ -123,12 +141,22 @@ class SSHKey(DOBOTOModule):
             fingerprint=dict(default=None),
             public_key=dict(default=None),
             name=dict(default=None),
+            cache=dict(default=False, type='bool'),
+            cache_ttl=dict(default=None, type='int'),
+            transport=dict(default=None, choices=["direct", "broker"]),
+            rate_limit=dict(default=None, type='bool'),
+            stats=dict(default=None, type='bool'),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            batch=dict(default=None, type='list'),
+            max_in_flight=dict(default=None, type='int'),
             url=dict(default=self.url),
         ))
 
     def list(self):
-        self.module.exit_json(changed=False, ssh_keys=self.do.ssh_key.list())
+        self.module.exit_json(changed=False, ssh_keys=self.cached("ssh_key", "list"))
 
+    @invalidate("ssh_key")
     @require("name")
     @require("public_key")
     def create(self):
@@ -136,6 +164,7 @@ class SSHKey(DOBOTOModule):
             self.module.params["name"], self.module.params["public_key"]
         ))
 
+    @invalidate("ssh_key")
     @require("name")
     @require("public_key")
     def present(self):
@@ -146,10 +175,11 @@ class SSHKey(DOBOTOModule):
 
     @require("id", "fingerprint")
     def info(self):
-        self.module.exit_json(changed=False, ssh_key=self.do.ssh_key.info(
-            self.module.params["id"] or self.module.params["fingerprint"]
+        self.module.exit_json(changed=False, ssh_key=self.cached(
+            "ssh_key", "info", self.module.params["id"] or self.module.params["fingerprint"]
         ))
 
+    @invalidate("ssh_key")
     @require("id", "fingerprint")
     @require("name")
     def update(self):
@@ -158,6 +188,7 @@ class SSHKey(DOBOTOModule):
             self.module.params["name"]
         ))
 
+    @invalidate("ssh_key")
     @require("id", "fingerprint")
     def destroy(self):
         self.module.exit_json(changed=True, result=self.do.ssh_key.destroy(
@@ -47,20 +47,41 @@ options:
             - destroy
             - attach
             - detach
+            - exact
     name:
         description: same as DO API variable
     new_name:
         description: same as DO API variable, new name for updating
     resources:
-        description: same as DO API variable
+        description: same as DO API variable, with exact the droplets the tag should have, no more and no less
     resource_type:
         description: same as DO API variable, use if doing a single resource type
     resource_id:
         description: same as DO API variable, use if doing a single resource id
     resource_ids:
         description: paired with a single resource_type to build a resources list
+    chunk_size:
+        description: most resources to attach or detach per request, more are sent in concurrent chunks with failed chunks retried alone (default 50)
+    poll:
+        description: the most to pause before retrying a failed chunk, with backoff (default 5 seconds)
+    poll_strategy:
+        description: fixed to pause poll seconds before a retry, or backoff to start at a second and double with jitter up to poll (default backoff)
     url:
-        description: URL to use if not official (for experimenting)
+        description: URL to use if not official (for experimenting, uses DO_API_URL from ENV if not found)
+    transport:
+        description: direct, or broker to share a warm keep-alive client across runs (uses DOBOTO_TRANSPORT from ENV if not found, default direct)
+    rate_limit:
+        description: pace API calls across all processes using this token and report the calls made, how many waited and for how long (uses DOBOTO_RATE_LIMIT from ENV if not found)
+    stats:
+        description: return _doboto_stats with per endpoint call counts, bytes received, API time and time sleeping in polls and retries (uses DOBOTO_STATS from ENV if not found)
+    fields:
+        description: dotted paths of the fields to keep in each resource returned, like id or networks.v4.ip_address
+    query:
+        description: JMESPath expression to apply to what's returned before fields (requires jmespath)
+    batch:
+        description: list of items, each overriding options for one run of the action, run concurrently with results in the same order
+    max_in_flight:
+        description: most API operations to run at once within this run (default 10)
 '''
 
 EXAMPLES = '''
@@ -175,6 +196,10 @@ EXAMPLES = '''
 
 class Tag(DOBOTOModule):
 
+    chunk_size = 50
+    chunk_retries = 1
+    chunk_errors = ["bad_request", "unauthorized", "forbidden", "not_found", "unprocessable_entity"]
+
     def input(self):
 
         return AnsibleModule(argument_spec=dict(
@@ -188,6 +213,7 @@ class Tag(DOBOTOModule):
                 "destroy",
                 "attach",
                 "detach",
+                "exact",
             ]),
             token=dict(default=None, no_log=True),
             name=dict(default=None),
@@ -196,6 +222,16 @@ class Tag(DOBOTOModule):
             resource_type=dict(default=None),
             resource_id=dict(default=None),
             resource_ids=dict(default=None, type='list'),
+            chunk_size=dict(default=None, type='int'),
+            poll=dict(default=5, type='int'),
+            poll_strategy=dict(default=None, choices=["fixed", "backoff"]),
+            transport=dict(default=None, choices=["direct", "broker"]),
+            rate_limit=dict(default=None, type='bool'),
+            stats=dict(default=None, type='bool'),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            batch=dict(default=None, type='list'),
+            max_in_flight=dict(default=None, type='int'),
             url=dict(default=self.url),
         ))
 
@@ -249,6 +285,79 @@ class Tag(DOBOTOModule):
 
         return resources
 
+    def chunks(self, action, resources):
+        """
+        Splits resources into chunk_size chunks to attach or detach
+        """
+
+        size = self.module.params["chunk_size"] or self.chunk_size
+
+        return [(action, resources[start:start + size]) for start in range(0, len(resources), size)]
+
+    def send(self, chunks):
+        """
+        Attaches or detaches each chunk, max_in_flight requests at a time, retrying each chunk
+        that failed other than for a client error alone after a pause, returning each chunk's
+        outcome even when the request couldn't be made or its error wasn't JSON
+        """
+
+        def retryable(failure):
+
+            # DOBOTO keeps only the error body, so client errors (all but 429) are told by its id
+
+            if failure.get("transient"):
+                return True
+
+            if "result" not in failure:
+                return False
+
+            return not (isinstance(failure["result"], dict) and failure["result"].get("id") in self.chunk_errors)
+
+        def send(index):
+
+            (action, resources) = chunks[index]
+            intervals = self.intervals()
+            attempts = 0
+
+            while True:
+
+                attempts += 1
+
+                (result, failure) = self.attempt_transient(
+                    getattr(self.do.tag, action), self.module.params["name"], resources
+                )
+
+                if failure is None or attempts > self.chunk_retries or not retryable(failure):
+                    break
+
+                self.sleep(next(intervals))
+
+            outcome = {"chunk": index, "action": action, "resources": resources, "attempts": attempts}
+
+            if failure is not None:
+                outcome.update(failed=True, **failure)
+
+            return outcome
+
+        return self.concurrently(send, list(range(len(chunks))))
+
+    def resources_action(self, resources):
+        """
+        Attaches or detaches resources in concurrent chunks
+        """
+
+        chunks = self.chunks(self.module.params["action"], resources)
+        outcomes = self.send(chunks)
+        failures = len([outcome for outcome in outcomes if outcome.get("failed")])
+
+        if failures:
+            self.module.fail_json(
+                msg="%s of %s chunks failed to %s" % (failures, len(chunks), self.module.params["action"]),
+                changed=failures < len(chunks), chunks=outcomes
+            )
+
+        self.module.exit_json(changed=True, result=None, chunks=outcomes)
+
     @require("name")
     def attach(self):
 
@@ -259,6 +368,9 @@ class Tag(DOBOTOModule):
                 msg="the resources or resource_type and resource_id(s) parameters are required"
             )
 
+        if len(resources) > (self.module.params["chunk_size"] or self.chunk_size):
+            self.resources_action(resources)
+
         self.module.exit_json(changed=True, result=self.do.tag.attach(
             self.module.params["name"], resources
         ))
@@ -273,10 +385,73 @@ class Tag(DOBOTOModule):
                 msg="the resources or resource_type and resource_id(s) parameters are required"
             )
 
+        if len(resources) > (self.module.params["chunk_size"] or self.chunk_size):
+            self.resources_action(resources)
+
         self.module.exit_json(changed=True, result=self.do.tag.detach(
             self.module.params["name"], resources
         ))
 
+    @require("name")
+    @require("resources", "resource_ids", "resource_id")
+    def exact(self):
+        """
+        Makes the tag's resources exactly those given, attaching and detaching only the
+        difference, read from one tag info and at most one listing of the tagged droplets
+        """
+
+        if self.module.params["resource_type"] is None and (
+            self.module.params["resource_id"] is not None or self.module.params["resource_ids"] is not None
+        ):
+            self.module.fail_json(msg="resource_type is required with resource_id or resource_ids")
+
+        resources = self.build()
+
+        if [resource for resource in resources if resource["resource_type"] != "droplet"]:
+            self.module.fail_json(msg="only droplet resources can be made exact")
+
+        tag = self.found(self.do.tag.info, self.module.params["name"])
+        created = tag is None
+
+        if created:
+            tag = self.do.tag.create(self.module.params["name"])
+
+        current = []
+
+        if tag["resources"]["droplets"]["count"]:
+            current = [
+                str(droplet["id"]) for droplet in self.do.droplet.list(tag_name=self.module.params["name"])
+            ]
+
+        desired = []
+
+        for resource in resources:
+            if str(resource["resource_id"]) not in desired:
+                desired.append(str(resource["resource_id"]))
+
+        attached = [resource_id for resource_id in desired if resource_id not in current]
+        detached = [resource_id for resource_id in current if resource_id not in desired]
+
+        chunks = []
+
+        for (action, resource_ids) in [("attach", attached), ("detach", detached)]:
+            chunks.extend(self.chunks(action, [
+                {"resource_type": "droplet", "resource_id": resource_id} for resource_id in resource_ids
+            ]))
+
+        outcomes = self.send(chunks)
+        failures = len([outcome for outcome in outcomes if outcome.get("failed")])
+
+        if failures:
+            self.module.fail_json(
+                msg="%s of %s chunks failed to make the tag exact" % (failures, len(chunks)),
+                changed=created or failures < len(chunks), attached=attached, detached=detached, chunks=outcomes
+            )
+
+        self.module.exit_json(
+            changed=created or len(chunks) > 0, attached=attached, detached=detached, chunks=outcomes
+        )
+
     @require("name")
     def destroy(self):
         self.module.exit_json(changed=True, result=self.do.tag.destroy(
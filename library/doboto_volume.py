@@ -1,9 +1,11 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import re
 import time
+import threading
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.doboto_module import require, DOBOTOModule
+from ansible.module_utils.doboto_module import require, invalidate, DOBOTOModule
 
 """
 Ansible module to manage DigitalOcean volumes
@@ -45,6 +47,7 @@ options:
             - destroy
             - snapshot_list
             - snapshot_create
+            - snapshot_rotate
             - attach
             - detach
             - resize
@@ -63,19 +66,47 @@ options:
     snapshot_id:
         description: same as DO API variable
     snapshot_name:
-        description: name to give a snapshot
+        description: name to give a snapshot, with snapshot_rotate formatted with each volume's fields, like %(name)s-nightly
+    keep:
+        description: with snapshot_rotate, how many of each volume's latest snapshots to keep, counting the new one
+    keep_days:
+        description: with snapshot_rotate, destroy each volume's snapshots older than this many days (other than the new one)
     droplet_id:
         description: same as DO API variable
+    volumes:
+        description: volume ids or names (with region) to attach or detach, concurrently across droplets and one at a time per droplet
+    droplet_ids:
+        description: droplet id for each of volumes, in the same order (uses droplet_id for all if not found)
     wait:
         description: wait until tasks has completed before continuing
     poll:
-        description: poll value to check while waiting (default 5 seconds)
+        description: poll value to check while waiting, the most between checks with backoff (default 5 seconds)
     timeout:
         description: timeout value to give up after waiting (default 300 seconds)
+    poll_strategy:
+        description: fixed to check every poll seconds, or backoff to start at a second and double with jitter up to poll (default backoff)
     action_id:
         description: same as DO API variable (action id)
     url:
-        description: URL to use if not official (for experimenting)
+        description: URL to use if not official (for experimenting, uses DO_API_URL from ENV if not found)
+    transport:
+        description: direct, or broker to share a warm keep-alive client across runs (uses DOBOTO_TRANSPORT from ENV if not found, default direct)
+    rate_limit:
+        description: pace API calls across all processes using this token and report the calls made, how many waited and for how long (uses DOBOTO_RATE_LIMIT from ENV if not found)
+    stats:
+        description: return _doboto_stats with per endpoint call counts, bytes received, API time and time sleeping in polls and retries (uses DOBOTO_STATS from ENV if not found)
+    fields:
+        description: dotted paths of the fields to keep in each resource returned, like id or networks.v4.ip_address
+    query:
+        description: JMESPath expression to apply to what's returned before fields (requires jmespath)
+    batch:
+        description: list of items, each overriding options for one run of the action, run concurrently with results in the same order
+    max_in_flight:
+        description: most API operations to run at once within this run (default 10)
+    cache:
+        description: serve list and info results, and volumes by name and region, from an on disk cache (uses DOBOTO_CACHE_DIR from ENV, default ~/.ansible/tmp/doboto)
+    cache_ttl:
+        description: seconds a cached result is reused (default 300 seconds)
 
 '''
 
@@ -203,6 +234,15 @@ EXAMPLES = '''
 
 class Volume(DOBOTOModule):
 
+    def __init__(self):
+
+        self.batched = False
+        self.index = {}
+        self.indexed = threading.Event()
+        self.indexing = threading.Lock()
+
+        super(Volume, self).__init__()
+
     def input(self):
 
         return AnsibleModule(argument_spec=dict(
@@ -214,6 +254,7 @@ class Volume(DOBOTOModule):
                 "destroy",
                 "snapshot_list",
                 "snapshot_create",
+                "snapshot_rotate",
                 "attach",
                 "detach",
                 "resize",
@@ -228,19 +269,86 @@ class Volume(DOBOTOModule):
             size_gigabytes=dict(default=None),
             snapshot_id=dict(default=None),
             snapshot_name=dict(default=None),
+            keep=dict(default=None, type='int'),
+            keep_days=dict(default=None, type='int'),
             droplet_id=dict(default=None),
+            volumes=dict(default=None, type='list'),
+            droplet_ids=dict(default=None, type='list'),
             wait=dict(default=False, type='bool'),
             poll=dict(default=5, type='int'),
             timeout=dict(default=300, type='int'),
+            poll_strategy=dict(default=None, choices=["fixed", "backoff"]),
             action_id=dict(default=None),
+            transport=dict(default=None, choices=["direct", "broker"]),
+            rate_limit=dict(default=None, type='bool'),
+            stats=dict(default=None, type='bool'),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            batch=dict(default=None, type='list'),
+            max_in_flight=dict(default=None, type='int'),
+            cache=dict(default=False, type='bool'),
+            cache_ttl=dict(default=None, type='int'),
             url=dict(default=self.url)
         ))
 
+    def batch(self):
+
+        self.batched = len(self.module.params["batch"]) > 1
+
+        super(Volume, self).batch()
+
     def list(self):
-        self.module.exit_json(changed=False, volumes=self.do.volume.list(
-            region=self.module.params["region"]
+        self.module.exit_json(changed=False, volumes=self.cached(
+            "volume", "list", region=self.module.params["region"]
         ))
 
+    def indexes(self):
+        """
+        Whether to find volumes by name and region in the index rather than asking the API
+        """
+
+        return self.module.params["cache"] or self.batched
+
+    def indexed_volumes(self):
+        """
+        Every volume, indexed by region and name, built once a run from one list of them all
+        (cached on disk with cache)
+        """
+
+        with self.indexing:
+
+            if not self.indexed.is_set():
+
+                for volume in self.cached("volume", "list", region=None):
+                    self.index.setdefault((volume["region"]["slug"], volume["name"]), volume)
+
+                self.indexed.set()
+
+            return dict(self.index)
+
+    def indexed_volume(self, name, region):
+        """
+        Finds a volume by name and region in the index, None if it isn't there
+        """
+
+        return self.indexed_volumes().get((region, name))
+
+    def reindex(self, volume=None, id=None, name=None, region=None):
+        """
+        Keeps this run's index current with a volume created, or one destroyed by id or name
+        and region
+        """
+
+        with self.indexing:
+
+            if volume is not None:
+                self.index[(volume["region"]["slug"], volume["name"])] = volume
+                return
+
+            for (key, indexed) in list(self.index.items()):
+                if indexed["id"] == id or key == (region, name):
+                    del self.index[key]
+
     def attribs(self):
 
         attribs = {
@@ -254,6 +362,7 @@ class Volume(DOBOTOModule):
 
         return attribs
 
+    @invalidate("volume")
     @require("name")
     @require("size_gigabytes")
     @require("region", "snapshot_id")
@@ -261,13 +370,12 @@ class Volume(DOBOTOModule):
 
         attribs = self.attribs()
 
-        self.module.exit_json(changed=True, volume=self.do.volume.create(
-            attribs,
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        volume = self.do.volume.create(attribs, wait=False, poll=None, timeout=None)
+        self.reindex(volume)
+
+        self.module.exit_json(changed=True, volume=self.volume_result(volume))
 
+    @invalidate("volume")
     @require("name")
     @require("size_gigabytes")
     @require("region", "snapshot_id")
@@ -275,33 +383,63 @@ class Volume(DOBOTOModule):
 
         attribs = self.attribs()
 
+        if self.indexes() and self.module.params["region"] is not None:
+
+            volume = self.indexed_volume(self.module.params["name"], self.module.params["region"])
+
+            if volume is not None:
+                self.module.exit_json(changed=False, volume=volume, created=None)
+
         (volume, created) = self.do.volume.present(
-            attribs,
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
+            attribs, wait=False, poll=None, timeout=None
         )
+
+        if created is not None:
+            self.reindex(created)
+            volume = created = self.volume_result(created)
+
         self.module.exit_json(changed=(created is not None), volume=volume, created=created)
 
+    def volume_result(self, volume):
+        """
+        Waits for a created volume to be retrievable if asked to
+        """
+
+        if not self.module.params["wait"]:
+            return volume
+
+        return self.wait_for(
+            volume, lambda volume: self.do.volume.info(id=volume["id"], name=None, region=None)
+        )
+
     def info(self):
 
         result = None
 
         if self.module.params["id"] is not None:
 
-            self.module.exit_json(changed=False, volume=self.do.volume.info(
-                id=self.module.params["id"]
+            self.module.exit_json(changed=False, volume=self.cached(
+                "volume", "info", id=self.module.params["id"]
             ))
 
         elif self.module.params["name"] is not None and self.module.params["region"] is not None:
 
-            self.module.exit_json(changed=False, volume=self.do.volume.info(
-                name=self.module.params["name"], region=self.module.params["region"]
-            ))
+            volume = None
+
+            if self.indexes():
+                volume = self.indexed_volume(self.module.params["name"], self.module.params["region"])
+
+            if volume is None:
+                volume = self.do.volume.info(
+                    name=self.module.params["name"], region=self.module.params["region"]
+                )
+
+            self.module.exit_json(changed=False, volume=volume)
 
         else:
             self.module.fail_json(msg="the id or name and region parameters are required")
 
+    @invalidate("volume")
     def destroy(self):
 
         result = None
@@ -310,12 +448,16 @@ class Volume(DOBOTOModule):
 
             result = self.do.volume.destroy(id=self.module.params["id"])
 
+            self.reindex(id=self.module.params["id"])
+
         elif self.module.params["name"] is not None and self.module.params["region"] is not None:
 
             result = self.do.volume.destroy(
                 name=self.module.params["name"], region=self.module.params["region"]
             )
 
+            self.reindex(name=self.module.params["name"], region=self.module.params["region"])
+
         else:
             self.module.fail_json(msg="the id or name and region parameters are required")
 
@@ -334,43 +476,250 @@ class Volume(DOBOTOModule):
             id=self.module.params["id"], snapshot_name=self.module.params["snapshot_name"]
         ))
 
-    @require("id", "name")
-    @require("droplet_id")
+    @require("volumes", "region")
+    @require("snapshot_name")
+    @require("keep", "keep_days")
+    def snapshot_rotate(self):
+        """
+        Snapshots many volumes at once, then destroys the snapshots each of them no longer
+        keeps, from one list of every volume snapshot
+        """
+
+        region = self.module.params["region"]
+        indexed = self.indexed_volumes()
+
+        if self.module.params["volumes"] is None:
+            volumes = [indexed[key] for key in sorted(indexed.keys()) if key[0] == region]
+        else:
+            volumes = []
+            for given in self.module.params["volumes"]:
+                if self.identified(given):
+                    found = [volume for volume in indexed.values() if volume["id"] == given]
+                else:
+                    found = [indexed[key] for key in [(region, given)] if key in indexed]
+                if not found:
+                    self.module.fail_json(msg="volume %s not found" % given)
+                if found[0]["id"] not in [volume["id"] for volume in volumes]:
+                    volumes.append(found[0])
+
+        names = {}
+
+        for volume in volumes:
+            try:
+                names[volume["id"]] = self.module.params["snapshot_name"] % volume
+            except (TypeError, ValueError, KeyError) as exception:
+                self.module.fail_json(msg="snapshot_name %s can't be formatted for volume %s: %s" % (
+                    self.module.params["snapshot_name"], volume["name"], exception
+                ))
+
+        def create(volume):
+
+            (snapshot, failure) = self.attempt(
+                self.do.volume.snapshot_create, id=volume["id"], snapshot_name=names[volume["id"]]
+            )
+
+            result = {"volume": volume["id"], "name": volume["name"]}
+
+            if failure is not None:
+                result.update(failed=True, **failure)
+            else:
+                result["snapshot"] = snapshot
+
+            return result
+
+        results = self.concurrently(create, volumes)
+
+        snapshots = [result["snapshot"] for result in results if "snapshot" in result]
+        created = dict([(snapshot["resource_id"], snapshot) for snapshot in snapshots])
+        sources = {}
+
+        for (position, snapshot) in enumerate(self.do.snapshot.list(resource_type="volume")):
+            if snapshot["resource_id"] in created:
+                sources.setdefault(snapshot["resource_id"], []).append(
+                    (snapshot["created_at"], position, snapshot)
+                )
+
+        cutoff = None
+
+        if self.module.params["keep_days"] is not None:
+            cutoff = time.strftime(
+                "%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - self.module.params["keep_days"] * 86400)
+            )
+
+        expired = []
+
+        for (volume_id, listed) in sources.items():
+
+            kept = 0
+
+            for (created_at, _, snapshot) in sorted(listed, key=lambda entry: entry[:2], reverse=True):
+
+                if snapshot["id"] == created[volume_id]["id"]:
+                    kept += 1
+                    continue
+
+                if (self.module.params["keep"] is not None and kept >= self.module.params["keep"]) or \
+                   (cutoff is not None and created_at < cutoff):
+                    expired.append(snapshot)
+                else:
+                    kept += 1
+
+        def destroy(snapshot):
+
+            (_, failure) = self.attempt(self.do.snapshot.destroy, id=snapshot["id"])
+
+            if failure is not None:
+                failure.update(failed=True, snapshot=snapshot["id"])
+
+            return failure
+
+        failures = [failure for failure in self.concurrently(destroy, expired) if failure is not None]
+        undestroyed = [failure["snapshot"] for failure in failures]
+        destroyed = [snapshot for snapshot in expired if snapshot["id"] not in undestroyed]
+        failed = len([result for result in results if result.get("failed")])
+
+        if failed or failures:
+            self.module.fail_json(
+                msg="%s of %s volumes failed to snapshot, %s of %s snapshots failed to destroy" % (
+                    failed, len(volumes), len(failures), len(expired)
+                ),
+                changed=len(snapshots) > 0 or len(destroyed) > 0,
+                snapshots=snapshots, destroyed=destroyed, results=results, failures=failures
+            )
+
+        self.module.exit_json(
+            changed=len(snapshots) > 0 or len(destroyed) > 0,
+            snapshots=snapshots, destroyed=destroyed, results=results
+        )
+
+    def identified(self, volume):
+        """
+        Whether a volume is given by id rather than name
+        """
+
+        return re.match(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", str(volume)) is not None
+
+    def droplets_action(self):
+        """
+        Attaches or detaches each of volumes to its droplet, concurrently across droplets but one
+        at a time per droplet, as the API allows, waiting on each round of actions together
+        """
+
+        volumes = self.module.params["volumes"]
+        droplet_ids = self.module.params["droplet_ids"]
+
+        if droplet_ids is None:
+            if self.module.params["droplet_id"] is None:
+                self.module.fail_json(msg="the droplet_id or droplet_ids parameter is required")
+            droplet_ids = [self.module.params["droplet_id"]] * len(volumes)
+
+        if len(droplet_ids) != len(volumes):
+            self.module.fail_json(msg="volumes and droplet_ids must be the same length")
+
+        queues = {}
+        order = []
+
+        for (index, droplet_id) in enumerate(droplet_ids):
+            if str(droplet_id) not in queues:
+                queues[str(droplet_id)] = []
+                order.append(str(droplet_id))
+            queues[str(droplet_id)].append(index)
+
+        def begin(index):
+
+            if self.identified(volumes[index]):
+                volume = {"id": volumes[index]}
+            else:
+                volume = {"name": volumes[index]}
+
+            (action, failure) = self.attempt(
+                getattr(self.do.volume, self.module.params["action"]),
+                droplet_id=droplet_ids[index], region=self.module.params["region"],
+                wait=False, poll=None, timeout=None, **volume
+            )
+
+            result = {"volume": volumes[index], "droplet_id": droplet_ids[index]}
+
+            if failure is not None:
+                result.update(failed=True, **failure)
+            else:
+                result["action"] = action
+
+            return result
+
+        results = [None] * len(volumes)
+        rounds = max([len(queue) for queue in queues.values()] or [0])
+
+        for number in range(rounds):
+
+            indexes = [queues[droplet_id][number] for droplet_id in order if number < len(queues[droplet_id])]
+            started = self.concurrently(begin, indexes)
+            waiting = [result for result in started if "action" in result]
+
+            if self.module.params["wait"] or number < rounds - 1:
+                for (result, action) in zip(waiting, self.actions_wait([result["action"] for result in waiting])):
+                    result["action"] = action
+                    if action["status"] == "errored":
+                        result.update(failed=True, msg="action errored")
+            else:
+                self.unfinished([result["action"] for result in waiting])
+
+            for (index, result) in zip(indexes, started):
+                results[index] = result
+
+        actions = [result["action"] for result in results if "action" in result]
+        failures = len([result for result in results if result.get("failed")])
+
+        if failures:
+            self.module.fail_json(
+                msg="%s of %s volumes failed to %s" % (failures, len(volumes), self.module.params["action"]),
+                changed=len(actions) > 0, actions=actions, results=results
+            )
+
+        self.module.exit_json(changed=len(actions) > 0, actions=actions, results=results)
+
+    @invalidate("volume")
+    @require("id", "name", "volumes")
+    @require("droplet_id", "droplet_ids")
     def attach(self):
-        self.module.exit_json(changed=True, action=self.do.volume.attach(
+
+        if self.module.params["volumes"] is not None:
+            self.droplets_action()
+
+        self.module.exit_json(changed=True, action=self.action_result(self.do.volume.attach(
             id=self.module.params["id"],
             name=self.module.params["name"],
             droplet_id=self.module.params["droplet_id"],
             region=self.module.params["region"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+            wait=False, poll=None, timeout=None
+        )))
 
-    @require("id", "name")
-    @require("droplet_id")
+    @invalidate("volume")
+    @require("id", "name", "volumes")
+    @require("droplet_id", "droplet_ids")
     def detach(self):
-        self.module.exit_json(changed=True, action=self.do.volume.detach(
+
+        if self.module.params["volumes"] is not None:
+            self.droplets_action()
+
+        self.module.exit_json(changed=True, action=self.action_result(self.do.volume.detach(
             id=self.module.params["id"],
             name=self.module.params["name"],
             droplet_id=self.module.params["droplet_id"],
             region=self.module.params["region"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+            wait=False, poll=None, timeout=None
+        )))
 
+    @invalidate("volume")
     @require("id", "name")
     @require("size_gigabytes")
     def resize(self):
-        self.module.exit_json(changed=True, action=self.do.volume.resize(
+        self.module.exit_json(changed=True, action=self.action_result(self.do.volume.resize(
             self.module.params["id"],
             self.module.params["size_gigabytes"],
             region=self.module.params["region"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+            wait=False, poll=None, timeout=None
+        )))
 
     @require("id")
     def action_list(self):
@@ -0,0 +1,475 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks the doboto modules against the fake DigitalOcean API
+
+Seeds the fake with fleets of droplets and runs each case as Ansible would,
+one module process per run, breaking every run down into:
+
+    startup   interpreter start up until the module is loaded
+    import    importing the module, the module utils, ansible and doboto
+    input     argument parsing (AnsibleModule)
+    client    setting up the transport, client and cache
+    http      time spent in API requests
+    act       everything else the action does
+    exit      exit_json, serializing and writing the result
+
+Run it before and after a change and compare:
+
+    python tests/benchmark.py --output before.json
+    python tests/benchmark.py --compare before.json
+
+Use --fleet to pick the fleet sizes (default 10,1000,10000), --runs for how
+many runs of each case and --case to limit the cases run.
+"""
+
+import os
+import sys
+import time
+import json
+import base64
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name, module, params (strings are formatted with the seeded fleet)
+#
+# Every case runs once unmeasured first, so writes are ones that settle after that
+# run and repeat as no-ops (present, exact, sync, export) or leave the fleet as they
+# found it (power_on, attach, snapshot_rotate).  Actions that create or destroy on
+# every run would change the fleet being measured and aren't cases.
+
+CASES = [
+    ("account.info", "account", {"action": "info"}),
+    ("action.list", "action", {"action": "list"}),
+    ("action.info", "action", {"action": "info", "id": "{action_id}"}),
+    ("certificate.list", "certificate", {"action": "list"}),
+    ("certificate.info", "certificate", {"action": "info", "id": "{certificate_id}"}),
+    ("domain.list", "domain", {"action": "list"}),
+    ("domain.info", "domain", {"action": "info", "name": "{domain}"}),
+    ("domain.record_list", "domain", {"action": "record_list", "name": "{domain}"}),
+    ("domain.record_info", "domain", {
+        "action": "record_info", "name": "{domain}", "record_type": "CNAME", "record_name": "www"
+    }),
+    ("domain.record_sync", "domain", {"action": "record_sync", "name": "{domain}", "records": [
+        {"type": "A", "name": "@", "data": "10.0.0.1"},
+        {"type": "CNAME", "name": "www", "data": "@"},
+        {"type": "MX", "name": "@", "data": "mail.bench.example.com.", "priority": 10}
+    ]}),
+    ("domain.zone_export", "domain", {"action": "zone_export", "name": "{domain}", "path": "{scratch}/bench.zone"}),
+    ("droplet.list", "droplet", {"action": "list"}),
+    ("droplet.list.tag", "droplet", {"action": "list", "tag_name": "{tag}"}),
+    ("droplet.info", "droplet", {"action": "info", "id": "{droplet_id}"}),
+    ("droplet.present", "droplet", {
+        "action": "present", "name": "{droplet_name}", "region": "nyc1", "size": "512mb",
+        "image": "ubuntu-16-04-x64"
+    }),
+    ("droplet.present.names", "droplet", {
+        "action": "present", "names": ["bench-%05d" % number for number in range(10)], "region": "nyc1",
+        "size": "512mb", "image": "ubuntu-16-04-x64"
+    }),
+    ("droplet.exact", "droplet", {
+        "action": "exact", "tag_name": "bench-exact", "count": 2, "name_template": "bench-exact-%02d",
+        "region": "nyc1", "size": "512mb", "image": "ubuntu-16-04-x64"
+    }),
+    ("droplet.power_on", "droplet", {"action": "power_on", "id": "{droplet_id}"}),
+    ("droplet.power_on.tag", "droplet", {"action": "power_on", "tag_name": "{tag}"}),
+    ("floating_ip.list", "floating_ip", {"action": "list"}),
+    ("floating_ip.info", "floating_ip", {"action": "info", "ip": "{ip}"}),
+    ("image.list", "image", {"action": "list"}),
+    ("image.info", "image", {"action": "info", "id": "{image_id}"}),
+    ("load_balancer.list", "load_balancer", {"action": "list"}),
+    ("load_balancer.info", "load_balancer", {"action": "info", "id": "{load_balancer_id}"}),
+    ("region.list", "region", {"action": "list"}),
+    ("size.list", "size", {"action": "list"}),
+    ("snapshot.list", "snapshot", {"action": "list"}),
+    ("snapshot.info", "snapshot", {"action": "info", "id": "{snapshot_id}"}),
+    ("ssh_key.list", "ssh_key", {"action": "list"}),
+    ("ssh_key.info", "ssh_key", {"action": "info", "id": "{ssh_key_id}"}),
+    ("tag.list", "tag", {"action": "list"}),
+    ("tag.info", "tag", {"action": "info", "name": "{tag}"}),
+    ("tag.attach", "tag", {
+        "action": "attach", "name": "{tag}", "resource_type": "droplet", "resource_id": "{droplet_id}"
+    }),
+    ("tag.exact", "tag", {
+        "action": "exact", "name": "bench-exact-tag", "resource_type": "droplet", "resource_id": "{droplet_id}"
+    }),
+    ("volume.list", "volume", {"action": "list"}),
+    ("volume.info", "volume", {"action": "info", "id": "{volume_id}"}),
+    ("volume.snapshot_rotate", "volume", {
+        "action": "snapshot_rotate", "volumes": ["bench-volume"], "region": "nyc1",
+        "snapshot_name": "%(name)s-bench", "keep": 1
+    })
+]
+
+PHASES = ["startup", "import", "input", "client", "http", "act", "exit"]
+
+
+def child(path, args):
+    """
+    Runs one module in this process, printing how long each phase took
+    """
+
+    start = time.time()
+    marks = {"requests": 0, "bytes": 0, "http": 0.0}
+
+    sys.argv = [path, args]
+
+    import ansible.module_utils
+    ansible.module_utils.__path__.insert(0, os.path.join(ROOT, "ansible", "module_utils"))
+
+    try:
+        import importlib.util
+        spec = importlib.util.spec_from_file_location("doboto_benchmarked", path)
+        library = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(library)
+    except ImportError:
+        import imp
+        library = imp.load_source("doboto_benchmarked", path)
+
+    from ansible.module_utils.basic import AnsibleModule
+    from ansible.module_utils.doboto_module import DOBOTOModule
+
+    marks["import"] = time.time()
+
+    (module,) = [
+        value for value in vars(library).values()
+        if isinstance(value, type) and issubclass(value, DOBOTOModule) and value is not DOBOTOModule
+    ]
+
+    def timed(cls, name, before=None, after=None):
+
+        function = getattr(cls, name)
+
+        def wrapper(self, *args, **kwargs):
+            if before is not None:
+                before(self)
+            try:
+                return function(self, *args, **kwargs)
+            finally:
+                if after is not None:
+                    after(self)
+
+        setattr(cls, name, wrapper)
+
+    def mark(name, first=False):
+        def marker(self):
+            if not first or name not in marks:
+                marks[name] = time.time()
+        return marker
+
+    def transport(self):
+        marks["requests"] += self.transport.calls.calls
+        marks["bytes"] += self.transport.calls.bytes
+        marks["http"] += self.transport.calls.seconds
+
+    timed(module, "input", after=mark("input"))
+    timed(module, "act", before=mark("act", True))
+    timed(module, "batch", before=mark("act", True))
+    timed(DOBOTOModule, "output", before=transport)
+    timed(AnsibleModule, "exit_json", before=mark("exit"), after=mark("exited"))
+    timed(AnsibleModule, "fail_json", before=mark("exit"), after=mark("exited"))
+
+    try:
+        from StringIO import StringIO
+    except ImportError:
+        from io import StringIO
+
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+
+    try:
+        module()
+    except SystemExit:
+        pass
+    finally:
+        output = sys.stdout.getvalue()
+        sys.stdout = stdout
+
+    end = time.time()
+
+    try:
+        result = json.loads(output.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        result = {"failed": True, "msg": output}
+
+    act = marks.get("act", marks.get("input", end))
+    exit = marks.get("exit", end)
+
+    sys.stdout.write(json.dumps({
+        "child": end - start,
+        "import": marks["import"] - start,
+        "input": marks.get("input", end) - marks["import"],
+        "client": act - marks.get("input", end),
+        "http": marks["http"],
+        "act": max(exit - act - marks["http"], 0.0),
+        "exit": marks.get("exited", end) - exit,
+        "requests": marks["requests"],
+        "bytes": marks["bytes"],
+        "failed": bool(result.get("failed")),
+        "msg": result.get("msg")
+    }) + "\n")
+
+
+def seed(api, fleet, tag="bench"):
+    """
+    Creates fleet droplets in the fake API, and one of each other resource the cases
+    look at, returning values for the case params
+    """
+
+    base = "http://127.0.0.1/v2"
+
+    def create(path, body, key):
+        return api.handle("POST", "/v2%s" % path, {}, body, "%s%s" % (base, path))[1][key]
+
+    for start in range(0, fleet, 10):
+        create("/droplets", {
+            "names": ["bench-%05d" % number for number in range(start, min(start + 10, fleet))],
+            "region": "nyc1", "size": "512mb", "image": "ubuntu-16-04-x64", "tags": [tag]
+        }, "droplets")
+
+    droplet = api.droplets[0]
+
+    domain = create("/domains", {"name": "bench.example.com", "ip_address": "10.0.0.1"}, "domain")
+    create("/domains/%s/records" % domain["name"], {"type": "CNAME", "name": "www", "data": "@"}, "domain_record")
+
+    volume = create("/volumes", {"name": "bench-volume", "region": "nyc1", "size_gigabytes": 10}, "volume")
+    snapshot = create("/volumes/%s/snapshots" % volume["id"], {"name": "bench-volume-bench"}, "snapshot")
+    floating_ip = create("/floating_ips", {"droplet_id": droplet["id"]}, "floating_ip")
+
+    ssh_key = create("/account/keys", {
+        "name": "bench", "public_key": "ssh-rsa %s bench" % base64.b64encode(b"bench-key").decode("ascii")
+    }, "ssh_key")
+    certificate = create("/certificates", {
+        "name": "bench", "private_key": "bench",
+        "leaf_certificate": "-----BEGIN CERTIFICATE-----\n%s\n-----END CERTIFICATE-----" % (
+            base64.b64encode(b"bench-certificate").decode("ascii")
+        )
+    }, "certificate")
+    load_balancer = create("/load_balancers", {
+        "name": "bench", "region": "nyc1", "tag": tag, "forwarding_rules": [{
+            "entry_protocol": "http", "entry_port": 80, "target_protocol": "http", "target_port": 80
+        }]
+    }, "load_balancer")
+
+    with api.lock:
+        api.settle()
+
+    return {
+        "tag": tag,
+        "droplet_id": droplet["id"],
+        "droplet_name": droplet["name"],
+        "action_id": api.actions[0]["id"],
+        "domain": domain["name"],
+        "volume_id": volume["id"],
+        "snapshot_id": snapshot["id"],
+        "ip": floating_ip["ip"],
+        "image_id": api.images[0]["id"],
+        "ssh_key_id": ssh_key["id"],
+        "certificate_id": certificate["id"],
+        "load_balancer_id": load_balancer["id"]
+    }
+
+
+def percentile(values, percent):
+    """
+    Nearest rank percentile
+    """
+
+    values = sorted(values)
+
+    return values[max(int(round(percent / 100.0 * len(values) + 0.5)) - 1, 0)] if values else 0.0
+
+
+def run(python, path, params, env, scratch):
+    """
+    Runs a module once in its own process, returning its phases
+    """
+
+    import subprocess
+
+    args = os.path.join(scratch, "args.json")
+
+    with open(args, "w") as args_file:
+        json.dump({"ANSIBLE_MODULE_ARGS": params}, args_file)
+
+    start = time.time()
+    process = subprocess.Popen(
+        [python, os.path.abspath(__file__), "--child", path, args],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env
+    )
+    (stdout, stderr) = process.communicate()
+    wall = time.time() - start
+
+    try:
+        phases = json.loads(stdout.decode("utf-8").strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        raise Exception("benchmark run failed: %s" % stderr.decode("utf-8"))
+
+    phases["wall"] = wall
+    phases["startup"] = max(wall - phases["child"], 0.0)
+
+    return phases
+
+
+def summarize(runs):
+    """
+    Throughput and p50/p99 of each phase across runs
+    """
+
+    summary = {
+        "runs": len(runs),
+        "throughput": len(runs) / sum([phases["wall"] for phases in runs]),
+        "requests": percentile([phases["requests"] for phases in runs], 50),
+        "bytes": percentile([phases["bytes"] for phases in runs], 50),
+        "failed": len([phases for phases in runs if phases["failed"]])
+    }
+
+    for phase in ["wall"] + PHASES:
+        values = [phases[phase] for phases in runs]
+        summary[phase] = {"p50": percentile(values, 50), "p99": percentile(values, 99)}
+
+    return summary
+
+
+def report(results, compare=None):
+    """
+    Writes a table of p50 milliseconds per phase, against compare if given
+    """
+
+    columns = ["runs/s", "p50", "p99"] + PHASES + ["reqs"]
+
+    for (fleet, cases) in sorted(results.items(), key=lambda item: int(item[0])):
+
+        sys.stdout.write("\nfleet of %s droplets (ms)\n" % fleet)
+        sys.stdout.write("%-20s%s\n" % ("case", "".join(["%9s" % column for column in columns])))
+
+        for (name, summary) in sorted(cases.items()):
+
+            values = [
+                "%9.1f" % summary["throughput"],
+                "%9.1f" % (summary["wall"]["p50"] * 1000),
+                "%9.1f" % (summary["wall"]["p99"] * 1000)
+            ] + [
+                "%9.1f" % (summary[phase]["p50"] * 1000) for phase in PHASES
+            ] + [
+                "%9d" % summary["requests"]
+            ]
+
+            sys.stdout.write("%-20s%s" % (name, "".join(values)))
+
+            before = (compare or {}).get(fleet, {}).get(name)
+
+            if before is not None:
+                change = (summary["wall"]["p50"] / before["wall"]["p50"] - 1) * 100
+                sys.stdout.write("  %+.1f%%" % change)
+
+            if summary["failed"]:
+                sys.stdout.write("  (%s failed)" % summary["failed"])
+
+            sys.stdout.write("\n")
+
+
+def main(argv=None):
+
+    import shutil
+    import argparse
+    import tempfile
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import fake_api
+
+    parser = argparse.ArgumentParser(description="Benchmark the doboto modules against the fake DO API")
+    parser.add_argument("--fleet", default="10,1000,10000",
+                        help="comma separated fleet sizes to seed (default 10,1000,10000)")
+    parser.add_argument("--runs", type=int, default=20, help="runs of each case (default 20)")
+    parser.add_argument("--case", action="append", help="only run this case (repeatable)")
+    parser.add_argument("--python", default=sys.executable, help="interpreter to run the modules with")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the fake adds to every request (default 0)")
+    parser.add_argument("--param", action="append", default=[],
+                        help="name=value (JSON) added to every case's params, like stats=true")
+    parser.add_argument("--output", help="write the results as JSON here")
+    parser.add_argument("--compare", help="results JSON from an earlier run to compare against")
+
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if not args.case or case[0] in args.case]
+
+    extra = {}
+
+    for param in args.param:
+        (name, value) = param.split("=", 1)
+        try:
+            extra[name] = json.loads(value)
+        except ValueError:
+            extra[name] = value
+
+    compare = None
+
+    if args.compare:
+        with open(args.compare, "r") as compare_file:
+            compare = json.load(compare_file)["results"]
+
+    scratch = tempfile.mkdtemp()
+    results = {}
+
+    try:
+
+        for fleet in [int(fleet) for fleet in args.fleet.split(",")]:
+
+            server = fake_api.start(
+                action_seconds=0, rate_limit=10 ** 9, latency=args.latency
+            )
+
+            try:
+
+                values = seed(server.api, fleet)
+                values["scratch"] = scratch
+
+                env = dict(os.environ)
+                env.update({"DO_API_URL": server.url, "DO_API_TOKEN": "benchmark"})
+
+                results[str(fleet)] = {}
+
+                for (name, module, params) in cases:
+
+                    params = dict([
+                        (key, value.format(**values) if isinstance(value, str) else value)
+                        for (key, value) in params.items()
+                    ])
+                    params.update(extra)
+
+                    path = os.path.join(ROOT, "library", "doboto_%s.py" % module)
+
+                    run(args.python, path, params, env, scratch)
+
+                    results[str(fleet)][name] = summarize([
+                        run(args.python, path, params, env, scratch) for _ in range(args.runs)
+                    ])
+
+                    sys.stderr.write("fleet %s %s done\n" % (fleet, name))
+
+            finally:
+                server.shutdown()
+                server.server_close()
+
+    finally:
+        shutil.rmtree(scratch)
+
+    report(results, compare)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({
+                "python": args.python, "runs": args.runs, "latency": args.latency, "params": extra,
+                "results": results
+            }, output_file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3])
+    else:
+        main()
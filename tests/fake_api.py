@@ -0,0 +1,1782 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Fake DigitalOcean API for running the tests and benchmarks offline
+
+Serves the v2 endpoints the doboto modules use from memory, with actions that
+finish after a while, paged lists and rate limit headers.  Start it and point
+the modules at it:
+
+    python tests/fake_api.py --port 8080 &
+    DO_API_URL=http://127.0.0.1:8080/v2 DO_API_TOKEN=fake ansible-playbook ...
+
+Or from Python, where start() serves on a thread and returns the server:
+
+    server = start(action_seconds=0)
+    ... server.url ...
+    server.shutdown()
+"""
+
+import re
+import sys
+import time
+import json
+import uuid
+import base64
+import hashlib
+import argparse
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs, urlencode
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+    from urllib import urlencode
+
+
+REGIONS = [
+    ("nyc1", "New York 1"),
+    ("nyc2", "New York 2"),
+    ("nyc3", "New York 3"),
+    ("sfo1", "San Francisco 1"),
+    ("sfo2", "San Francisco 2"),
+    ("ams2", "Amsterdam 2"),
+    ("ams3", "Amsterdam 3"),
+    ("sgp1", "Singapore 1"),
+    ("lon1", "London 1"),
+    ("fra1", "Frankfurt 1"),
+    ("tor1", "Toronto 1"),
+    ("blr1", "Bangalore 1")
+]
+
+SIZES = [
+    ("512mb", 512, 1, 20, 1000, 5.0),
+    ("1gb", 1024, 1, 30, 2000, 10.0),
+    ("2gb", 2048, 2, 40, 3000, 20.0),
+    ("4gb", 4096, 2, 60, 4000, 40.0),
+    ("8gb", 8192, 4, 80, 5000, 80.0),
+    ("16gb", 16384, 8, 160, 6000, 160.0)
+]
+
+IMAGES = [
+    (1001, "7.11 x64", "Debian", "debian-7-0-x64", "distribution"),
+    (1002, "8.7 x64", "Debian", "debian-8-x64", "distribution"),
+    (1003, "14.04.5 x64", "Ubuntu", "ubuntu-14-04-x64", "distribution"),
+    (1004, "16.04.2 x64", "Ubuntu", "ubuntu-16-04-x64", "distribution"),
+    (1005, "7.3 x64", "CentOS", "centos-7-x64", "distribution"),
+    (1101, "WordPress on 16.04", "Ubuntu", "wordpress-16-04", "application"),
+    (1102, "Docker 17.03.0-ce on 16.04", "Ubuntu", "docker-16-04", "application")
+]
+
+KERNELS = [
+    (944, "Debian 7.0 x64 vmlinuz-3.2.0-4-amd64", "3.2.0-4-amd64"),
+    (945, "Debian 8.0 x64 vmlinuz-3.16.0-4-amd64", "3.16.0-4-amd64"),
+    (946, "Ubuntu 14.04 x64 vmlinuz-3.13.0-24-generic", "3.13.0-24-generic")
+]
+
+RECORD_TYPES = ["A", "AAAA", "CAA", "CNAME", "MX", "NS", "SOA", "SRV", "TXT"]
+
+
+def timestamp(seconds=None):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() if seconds is None else seconds))
+
+
+def public(data):
+    """
+    Copy of data without the keys only the fake uses, those starting with an underscore
+    """
+
+    if isinstance(data, list):
+        return [public(item) for item in data]
+
+    if isinstance(data, dict):
+        return dict([(key, public(value)) for (key, value) in data.items() if not key.startswith("_")])
+
+    return data
+
+
+class FakeAPIError(Exception):
+    """
+    Raised by handlers to return an API error
+    """
+
+    def __init__(self, status, id, message):
+        super(FakeAPIError, self).__init__(message)
+        self.status = status
+        self.id = id
+        self.message = message
+
+
+class NotFound(FakeAPIError):
+
+    def __init__(self):
+        super(NotFound, self).__init__(
+            404, "not_found", "The resource you were accessing could not be found."
+        )
+
+
+class Unprocessable(FakeAPIError):
+
+    def __init__(self, message):
+        super(Unprocessable, self).__init__(422, "unprocessable_entity", message)
+
+
+class FakeAPI(object):
+    """
+    In memory DigitalOcean account and the v2 endpoints over it
+    """
+
+    account_uuid = "b60c5d2212bf79e1a2bb0e3c1b2ae30a617fb796"
+
+    # seconds each kind of action takes, relative to action_seconds
+
+    durations = {
+        "transfer": 30,
+        "resize_volume": 0,
+        "destroy": 0
+    }
+
+    def __init__(self, action_seconds=2.0, rate_limit=5000, rate_window=3600, per_page_max=200,
+                 latency=0.0):
+
+        self.action_seconds = action_seconds
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.per_page_max = per_page_max
+        self.latency = latency
+
+        self.lock = threading.RLock()
+        self.ids = 1000000
+        self.window = (0, 0)
+        self.pending = []
+
+        self.regions = [{
+            "slug": slug,
+            "name": name,
+            "sizes": [size[0] for size in SIZES],
+            "available": True,
+            "features": ["private_networking", "backups", "ipv6", "metadata", "install_agent"]
+        } for (slug, name) in REGIONS]
+
+        self.sizes = [{
+            "slug": slug,
+            "memory": memory,
+            "vcpus": vcpus,
+            "disk": disk,
+            "transfer": transfer / 1000.0,
+            "price_monthly": monthly,
+            "price_hourly": round(monthly / 744, 5),
+            "regions": [region[0] for region in REGIONS],
+            "available": True
+        } for (slug, memory, vcpus, disk, transfer, monthly) in SIZES]
+
+        self.images = [{
+            "id": id,
+            "name": name,
+            "distribution": distribution,
+            "slug": slug,
+            "public": True,
+            "regions": [region[0] for region in REGIONS],
+            "created_at": timestamp(1483228800),
+            "type": type,
+            "min_disk_size": 20,
+            "size_gigabytes": 0.5
+        } for (id, name, distribution, slug, type) in IMAGES]
+
+        self.kernels = [
+            {"id": id, "name": name, "version": version} for (id, name, version) in KERNELS
+        ]
+
+        self.actions = []
+        self.droplets = []
+        self.volumes = []
+        self.snapshots = []
+        self.floating_ips = []
+        self.load_balancers = []
+        self.certificates = []
+        self.domains = []
+        self.records = {}
+        self.tags = []
+        self.ssh_keys = []
+
+        self.routes = [
+            (method, re.compile("^/v2%s$" % pattern), handler) for (method, pattern, handler) in [
+                ("GET", "/account", self.account_info),
+                ("GET", "/account/keys", self.ssh_key_list),
+                ("POST", "/account/keys", self.ssh_key_create),
+                ("GET", "/account/keys/([^/]+)", self.ssh_key_info),
+                ("PUT", "/account/keys/([^/]+)", self.ssh_key_update),
+                ("DELETE", "/account/keys/([^/]+)", self.ssh_key_destroy),
+                ("GET", "/actions", self.action_list),
+                ("GET", "/actions/(\\d+)", self.action_info),
+                ("GET", "/regions", self.region_list),
+                ("GET", "/sizes", self.size_list),
+                ("GET", "/droplets", self.droplet_list),
+                ("POST", "/droplets", self.droplet_create),
+                ("DELETE", "/droplets", self.droplet_destroy_tag),
+                ("POST", "/droplets/actions", self.droplet_action_tag),
+                ("GET", "/droplets/(\\d+)", self.droplet_info),
+                ("DELETE", "/droplets/(\\d+)", self.droplet_destroy),
+                ("GET", "/droplets/(\\d+)/actions", self.droplet_action_list),
+                ("POST", "/droplets/(\\d+)/actions", self.droplet_action),
+                ("GET", "/droplets/(\\d+)/actions/(\\d+)", self.droplet_action_info),
+                ("GET", "/droplets/(\\d+)/kernels", self.droplet_kernel_list),
+                ("GET", "/droplets/(\\d+)/snapshots", self.droplet_snapshot_list),
+                ("GET", "/droplets/(\\d+)/backups", self.droplet_backup_list),
+                ("GET", "/droplets/(\\d+)/neighbors", self.droplet_neighbor_list),
+                ("GET", "/reports/droplet_neighbors", self.droplet_neighbors_report),
+                ("GET", "/images", self.image_list),
+                ("GET", "/images/([^/]+)", self.image_info),
+                ("PUT", "/images/(\\d+)", self.image_update),
+                ("DELETE", "/images/(\\d+)", self.image_destroy),
+                ("GET", "/images/(\\d+)/actions", self.image_action_list),
+                ("POST", "/images/(\\d+)/actions", self.image_action),
+                ("GET", "/images/(\\d+)/actions/(\\d+)", self.image_action_info),
+                ("GET", "/snapshots", self.snapshot_list),
+                ("GET", "/snapshots/([^/]+)", self.snapshot_info),
+                ("DELETE", "/snapshots/([^/]+)", self.snapshot_destroy),
+                ("GET", "/volumes", self.volume_list),
+                ("POST", "/volumes", self.volume_create),
+                ("DELETE", "/volumes", self.volume_destroy_name),
+                ("POST", "/volumes/actions", self.volume_action_name),
+                ("GET", "/volumes/([^/]+)", self.volume_info),
+                ("DELETE", "/volumes/([^/]+)", self.volume_destroy),
+                ("GET", "/volumes/([^/]+)/snapshots", self.volume_snapshot_list),
+                ("POST", "/volumes/([^/]+)/snapshots", self.volume_snapshot_create),
+                ("GET", "/volumes/([^/]+)/actions", self.volume_action_list),
+                ("POST", "/volumes/([^/]+)/actions", self.volume_action),
+                ("GET", "/volumes/([^/]+)/actions/(\\d+)", self.volume_action_info),
+                ("GET", "/floating_ips", self.floating_ip_list),
+                ("POST", "/floating_ips", self.floating_ip_create),
+                ("GET", "/floating_ips/([^/]+)", self.floating_ip_info),
+                ("DELETE", "/floating_ips/([^/]+)", self.floating_ip_destroy),
+                ("GET", "/floating_ips/([^/]+)/actions", self.floating_ip_action_list),
+                ("POST", "/floating_ips/([^/]+)/actions", self.floating_ip_action),
+                ("GET", "/floating_ips/([^/]+)/actions/(\\d+)", self.floating_ip_action_info),
+                ("GET", "/load_balancers", self.load_balancer_list),
+                ("POST", "/load_balancers", self.load_balancer_create),
+                ("GET", "/load_balancers/([^/]+)", self.load_balancer_info),
+                ("PUT", "/load_balancers/([^/]+)", self.load_balancer_update),
+                ("DELETE", "/load_balancers/([^/]+)", self.load_balancer_destroy),
+                ("POST", "/load_balancers/([^/]+)/droplets", self.load_balancer_droplet_add),
+                ("DELETE", "/load_balancers/([^/]+)/droplets", self.load_balancer_droplet_remove),
+                ("POST", "/load_balancers/([^/]+)/forwarding_rules", self.load_balancer_rule_add),
+                ("DELETE", "/load_balancers/([^/]+)/forwarding_rules", self.load_balancer_rule_remove),
+                ("GET", "/certificates", self.certificate_list),
+                ("POST", "/certificates", self.certificate_create),
+                ("GET", "/certificates/([^/]+)", self.certificate_info),
+                ("DELETE", "/certificates/([^/]+)", self.certificate_destroy),
+                ("GET", "/domains", self.domain_list),
+                ("POST", "/domains", self.domain_create),
+                ("GET", "/domains/([^/]+)", self.domain_info),
+                ("DELETE", "/domains/([^/]+)", self.domain_destroy),
+                ("GET", "/domains/([^/]+)/records", self.record_list),
+                ("POST", "/domains/([^/]+)/records", self.record_create),
+                ("GET", "/domains/([^/]+)/records/(\\d+)", self.record_info),
+                ("PUT", "/domains/([^/]+)/records/(\\d+)", self.record_update),
+                ("DELETE", "/domains/([^/]+)/records/(\\d+)", self.record_destroy),
+                ("GET", "/tags", self.tag_list),
+                ("POST", "/tags", self.tag_create),
+                ("GET", "/tags/([^/]+)", self.tag_info),
+                ("PUT", "/tags/([^/]+)", self.tag_update),
+                ("DELETE", "/tags/([^/]+)", self.tag_destroy),
+                ("POST", "/tags/([^/]+)/resources", self.tag_attach),
+                ("DELETE", "/tags/([^/]+)/resources", self.tag_detach)
+            ]
+        ]
+
+    # plumbing
+
+    def handle(self, method, path, query, body, base):
+        """
+        Routes a request, returning its status and body
+        """
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        for (route_method, pattern, handler) in self.routes:
+
+            if route_method != method:
+                continue
+
+            match = pattern.match(path)
+
+            if match is None:
+                continue
+
+            with self.lock:
+                self.settle()
+                self.query = query
+                self.body = body if isinstance(body, dict) else {}
+                self.base = base
+                return handler(*match.groups())
+
+        raise NotFound()
+
+    def limit(self):
+        """
+        Counts a request against the rate limit, returning the headers to send and if it's over
+        """
+
+        with self.lock:
+
+            now = time.time()
+            (reset, remaining) = self.window
+
+            if now >= reset:
+                (reset, remaining) = (int(now) + self.rate_window, self.rate_limit)
+
+            over = remaining < 1
+            remaining = max(remaining - 1, 0)
+            self.window = (reset, remaining)
+
+        headers = {
+            "RateLimit-Limit": str(self.rate_limit),
+            "RateLimit-Remaining": str(remaining),
+            "RateLimit-Reset": str(reset)
+        }
+
+        if over:
+            headers["Retry-After"] = str(max(int(reset - now), 1))
+
+        return (headers, over)
+
+    def id(self):
+        self.ids += 1
+        return self.ids
+
+    def param(self, name, default=None):
+        return self.query.get(name, [default])[0]
+
+    def require(self, *names):
+        for name in names:
+            if self.body.get(name) in [None, ""]:
+                raise Unprocessable("%s is required" % name)
+
+    def number(self, name, value):
+
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise Unprocessable("%s must be a number" % name)
+
+    def find(self, items, value, key="id"):
+
+        for item in items:
+            if str(item[key]) == str(value):
+                return item
+
+        raise NotFound()
+
+    def page(self, key, items):
+        """
+        One page of items with the links and meta the API sends
+        """
+
+        try:
+            page = max(int(self.param("page", 1)), 1)
+            per_page = min(max(int(self.param("per_page", 20)), 1), self.per_page_max)
+        except ValueError:
+            raise Unprocessable("page and per_page must be numbers")
+
+        total = len(items)
+        last = max((total + per_page - 1) // per_page, 1)
+
+        def link(number):
+            query = dict([(name, values[0]) for (name, values) in self.query.items()])
+            query["page"] = number
+            query["per_page"] = per_page
+            return "%s?%s" % (self.base, urlencode(sorted(query.items())))
+
+        pages = {}
+
+        if page > 1:
+            pages["first"] = link(1)
+            pages["prev"] = link(page - 1)
+
+        if page < last:
+            pages["next"] = link(page + 1)
+            pages["last"] = link(last)
+
+        return (200, {
+            key: public(items[(page - 1) * per_page:page * per_page]),
+            "links": {"pages": pages},
+            "meta": {"total": total}
+        })
+
+    def region(self, slug):
+
+        for region in self.regions:
+            if region["slug"] == slug:
+                return region
+
+        raise Unprocessable("%s is not a valid region" % slug)
+
+    def size(self, slug):
+
+        for size in self.sizes:
+            if size["slug"] == slug:
+                return size
+
+        raise Unprocessable("%s is not a valid size" % slug)
+
+    def image(self, id_slug):
+
+        for image in self.images:
+            if str(image["id"]) == str(id_slug) or (image["slug"] is not None and image["slug"] == id_slug):
+                return image
+
+        raise NotFound()
+
+    # actions
+
+    def action(self, type, resource_type, resource_id, region=None, apply=None, **internal):
+        """
+        Starts an action, calling apply once it's finished
+        """
+
+        action = {
+            "id": self.id(),
+            "status": "in-progress",
+            "type": type,
+            "started_at": timestamp(),
+            "completed_at": None,
+            "resource_id": resource_id,
+            "resource_type": resource_type,
+            "region": region,
+            "region_slug": region["slug"] if region else None
+        }
+
+        for (name, value) in internal.items():
+            action["_%s" % name] = value
+
+        self.actions.insert(0, action)
+        self.later(self.durations.get(type, 1) * self.action_seconds, apply, action)
+
+        return action
+
+    def later(self, seconds, apply=None, action=None):
+
+        self.pending.append((time.time() + seconds, apply, action))
+        self.settle()
+
+    def settle(self):
+        """
+        Finishes whatever is due
+        """
+
+        now = time.time()
+        due = [pending for pending in self.pending if pending[0] <= now]
+        self.pending = [pending for pending in self.pending if pending[0] > now]
+
+        for (_, apply, action) in due:
+
+            if apply is not None:
+                apply()
+
+            if action is not None:
+                action["status"] = "completed"
+                action["completed_at"] = timestamp()
+
+    def actions_of(self, resource_type, resource_id):
+        return [action for action in self.actions
+                if action["resource_type"] == resource_type and str(action["resource_id"]) == str(resource_id)]
+
+    def action_list(self):
+        return self.page("actions", self.actions)
+
+    def action_info(self, id):
+        return (200, {"action": public(self.find(self.actions, id))})
+
+    # account, regions and sizes
+
+    def account_info(self):
+        return (200, {"account": {
+            "droplet_limit": 1000,
+            "floating_ip_limit": 100,
+            "email": "doboto@digitalocean.com",
+            "uuid": self.account_uuid,
+            "email_verified": True,
+            "status": "active",
+            "status_message": ""
+        }})
+
+    def region_list(self):
+        return self.page("regions", self.regions)
+
+    def size_list(self):
+        return self.page("sizes", self.sizes)
+
+    # ssh keys
+
+    def ssh_key(self, id_fingerprint):
+        for ssh_key in self.ssh_keys:
+            if str(ssh_key["id"]) == id_fingerprint or ssh_key["fingerprint"] == id_fingerprint:
+                return ssh_key
+        raise NotFound()
+
+    def ssh_key_list(self):
+        return self.page("ssh_keys", self.ssh_keys)
+
+    def ssh_key_create(self):
+
+        self.require("name", "public_key")
+
+        try:
+            key = base64.b64decode(self.body["public_key"].split()[1].encode("ascii"))
+        except (IndexError, TypeError, ValueError):
+            raise Unprocessable("Key invalid type, we support 'ssh-rsa', 'ssh-dss', 'ecdsa-sha2-nistp'")
+
+        digest = hashlib.md5(key).hexdigest()
+        fingerprint = ":".join([digest[index:index + 2] for index in range(0, len(digest), 2)])
+
+        if [ssh_key for ssh_key in self.ssh_keys if ssh_key["fingerprint"] == fingerprint]:
+            raise Unprocessable("SSH Key is already in use on your account")
+
+        ssh_key = {
+            "id": self.id(),
+            "fingerprint": fingerprint,
+            "public_key": self.body["public_key"],
+            "name": self.body["name"]
+        }
+
+        self.ssh_keys.append(ssh_key)
+
+        return (201, {"ssh_key": ssh_key})
+
+    def ssh_key_info(self, id_fingerprint):
+        return (200, {"ssh_key": self.ssh_key(id_fingerprint)})
+
+    def ssh_key_update(self, id_fingerprint):
+        ssh_key = self.ssh_key(id_fingerprint)
+        self.require("name")
+        ssh_key["name"] = self.body["name"]
+        return (200, {"ssh_key": ssh_key})
+
+    def ssh_key_destroy(self, id_fingerprint):
+        self.ssh_keys.remove(self.ssh_key(id_fingerprint))
+        return (204, None)
+
+    # droplets
+
+    def tagged(self, name):
+        return [droplet for droplet in self.droplets if name in droplet["tags"]]
+
+    def tag_present(self, name):
+
+        if not re.match("^[a-zA-Z0-9_\\-\\:]+$", name or ""):
+            raise Unprocessable("tag names must be letters, numbers, colons, dashes and underscores")
+
+        for tag in self.tags:
+            if tag["name"] == name:
+                return tag
+
+        tag = {"name": name}
+        self.tags.append(tag)
+
+        return tag
+
+    def address(self, prefix, number):
+        return "%s.%s.%s" % (prefix, (number // 256) % 256, number % 256)
+
+    def droplet_new(self, name, image, region, size):
+
+        id = self.id()
+
+        droplet = {
+            "id": id,
+            "name": name,
+            "memory": size["memory"],
+            "vcpus": size["vcpus"],
+            "disk": size["disk"],
+            "locked": False,
+            "status": "new",
+            "kernel": public(self.kernels[0]),
+            "created_at": timestamp(),
+            "features": [],
+            "backup_ids": [],
+            "next_backup_window": None,
+            "snapshot_ids": [],
+            "image": public(image),
+            "volume_ids": [],
+            "size": size,
+            "size_slug": size["slug"],
+            "networks": {"v4": [], "v6": []},
+            "region": region,
+            "tags": []
+        }
+
+        for tag in self.body.get("tags") or []:
+            self.tag_present(tag)
+            droplet["tags"].append(tag)
+
+        if self.body.get("backups"):
+            droplet["features"].append("backups")
+
+        if self.body.get("ipv6"):
+            droplet["features"].append("ipv6")
+
+        private_networking = bool(self.body.get("private_networking"))
+
+        def active():
+
+            if droplet not in self.droplets:
+                return
+
+            droplet["status"] = "active"
+            droplet["networks"]["v4"].append({
+                "ip_address": self.address("104.236", id), "netmask": "255.255.192.0",
+                "gateway": "104.236.0.1", "type": "public"
+            })
+
+            if private_networking:
+                self.droplet_private(droplet)
+
+            if "ipv6" in droplet["features"]:
+                self.droplet_ipv6(droplet)
+
+            if "backups" in droplet["features"]:
+                self.droplet_backups(droplet, True)
+
+        self.droplets.append(droplet)
+        self.action("create", "droplet", id, region, active)
+
+        return droplet
+
+    def droplet_private(self, droplet):
+
+        if "private_networking" not in droplet["features"]:
+            droplet["features"].append("private_networking")
+
+        if not [v4 for v4 in droplet["networks"]["v4"] if v4["type"] == "private"]:
+            droplet["networks"]["v4"].append({
+                "ip_address": self.address("10.132", droplet["id"]), "netmask": "255.255.0.0",
+                "gateway": "10.132.0.1", "type": "private"
+            })
+
+    def droplet_ipv6(self, droplet):
+
+        if "ipv6" not in droplet["features"]:
+            droplet["features"].append("ipv6")
+
+        if not droplet["networks"]["v6"]:
+            droplet["networks"]["v6"].append({
+                "ip_address": "2604:a880:800:10::%x" % droplet["id"], "netmask": 64,
+                "gateway": "2604:a880:800:10::1", "type": "public"
+            })
+
+    def droplet_backups(self, droplet, enabled):
+
+        if enabled:
+            if "backups" not in droplet["features"]:
+                droplet["features"].append("backups")
+            droplet["next_backup_window"] = {
+                "start": timestamp(time.time() + 86400), "end": timestamp(time.time() + 86400 + 25200)
+            }
+        else:
+            if "backups" in droplet["features"]:
+                droplet["features"].remove("backups")
+            droplet["next_backup_window"] = None
+
+    def droplet_list(self):
+
+        tag_name = self.param("tag_name")
+
+        if tag_name is not None:
+            return self.page("droplets", self.tagged(tag_name))
+
+        return self.page("droplets", self.droplets)
+
+    def droplet_create(self):
+
+        self.require("region", "size", "image")
+
+        region = self.region(self.body["region"])
+        size = self.size(self.body["size"])
+
+        try:
+            image = self.image(self.body["image"])
+        except NotFound:
+            raise Unprocessable("You specified an invalid image for Droplet creation.")
+
+        if "names" in self.body:
+
+            names = self.body["names"]
+
+            if not isinstance(names, list) or not names or len(names) > 10:
+                raise Unprocessable("names must be a list of 1 to 10 names")
+
+            for name in names:
+                self.hostname(name)
+
+            return (202, {"droplets": public([
+                self.droplet_new(name, image, region, size) for name in names
+            ])})
+
+        self.require("name")
+        self.hostname(self.body["name"])
+
+        return (202, {"droplet": public(self.droplet_new(self.body["name"], image, region, size))})
+
+    def hostname(self, name):
+
+        if not re.match(r"^[a-zA-Z0-9.-]+$", str(name)):
+            raise Unprocessable("Only valid hostname characters are allowed. (a-z, A-Z, 0-9, . and -)")
+
+    def droplet_info(self, id):
+        return (200, {"droplet": public(self.find(self.droplets, id))})
+
+    def droplet_remove(self, droplet):
+
+        self.droplets.remove(droplet)
+
+        for volume in self.volumes:
+            if droplet["id"] in volume["droplet_ids"]:
+                volume["droplet_ids"].remove(droplet["id"])
+
+        for floating_ip in self.floating_ips:
+            if floating_ip["droplet"] is not None and floating_ip["droplet"]["id"] == droplet["id"]:
+                floating_ip["droplet"] = None
+
+        for load_balancer in self.load_balancers:
+            if droplet["id"] in load_balancer["droplet_ids"]:
+                load_balancer["droplet_ids"].remove(droplet["id"])
+
+    def droplet_destroy(self, id):
+        self.droplet_remove(self.find(self.droplets, id))
+        return (204, None)
+
+    def droplet_destroy_tag(self):
+
+        tag_name = self.param("tag_name")
+
+        if tag_name is None:
+            raise NotFound()
+
+        for droplet in self.tagged(tag_name):
+            self.droplet_remove(droplet)
+
+        return (204, None)
+
+    def droplet_start(self, droplet):
+        """
+        Starts the action in the body on a droplet
+        """
+
+        type = self.body.get("type")
+        apply = None
+
+        def status(value):
+            def apply():
+                droplet["status"] = value
+            return apply
+
+        if type in ["reboot", "power_cycle", "power_on", "password_reset"]:
+            apply = status("active")
+        elif type in ["shutdown", "power_off"]:
+            apply = status("off")
+        elif type == "enable_backups":
+            apply = lambda: self.droplet_backups(droplet, True)
+        elif type == "disable_backups":
+            apply = lambda: self.droplet_backups(droplet, False)
+        elif type == "enable_ipv6":
+            apply = lambda: self.droplet_ipv6(droplet)
+        elif type == "enable_private_networking":
+            apply = lambda: self.droplet_private(droplet)
+        elif type == "resize":
+            size = self.size(self.body.get("size"))
+            disk = str(self.body.get("disk")).lower() == "true"
+
+            if size["disk"] < droplet["disk"]:
+                raise Unprocessable("This size is not available because it has a smaller disk.")
+
+            def apply():
+                droplet.update({
+                    "size": size, "size_slug": size["slug"], "memory": size["memory"], "vcpus": size["vcpus"]
+                })
+                if disk:
+                    droplet["disk"] = size["disk"]
+        elif type in ["rebuild", "restore"]:
+            try:
+                image = self.image(self.body.get("image"))
+            except NotFound:
+                raise Unprocessable("You specified an invalid image")
+
+            def apply():
+                droplet["image"] = public(image)
+                droplet["status"] = "active"
+        elif type == "rename":
+            name = self.body.get("name")
+            if not name:
+                raise Unprocessable("name is required")
+
+            def apply():
+                droplet["name"] = name
+        elif type == "change_kernel":
+            kernel = self.find(self.kernels, self.body.get("kernel"))
+
+            def apply():
+                droplet["kernel"] = public(kernel)
+        elif type == "snapshot":
+            name = self.body.get("name") or "%s-%s" % (droplet["name"], int(time.time()))
+
+            def apply():
+                self.image_snapshot(droplet, name, "snapshot")
+        else:
+            raise Unprocessable("%s is not a valid droplet action" % type)
+
+        return self.action(type, "droplet", droplet["id"], droplet["region"], apply)
+
+    def droplet_action(self, id):
+        return (201, {"action": public(self.droplet_start(self.find(self.droplets, id)))})
+
+    def droplet_action_tag(self):
+
+        tag_name = self.param("tag_name")
+
+        if tag_name is None:
+            raise Unprocessable("tag_name is required")
+
+        return (201, {"actions": public([self.droplet_start(droplet) for droplet in self.tagged(tag_name)])})
+
+    def droplet_action_list(self, id):
+        self.find(self.droplets, id)
+        return self.page("actions", self.actions_of("droplet", id))
+
+    def droplet_action_info(self, id, action_id):
+        self.find(self.droplets, id)
+        return (200, {"action": public(self.find(self.actions_of("droplet", id), action_id))})
+
+    def droplet_kernel_list(self, id):
+        self.find(self.droplets, id)
+        return self.page("kernels", self.kernels)
+
+    def droplet_snapshot_list(self, id):
+        droplet = self.find(self.droplets, id)
+        return self.page("snapshots", [image for image in self.images if image["id"] in droplet["snapshot_ids"]])
+
+    def droplet_backup_list(self, id):
+        droplet = self.find(self.droplets, id)
+        return self.page("backups", [image for image in self.images if image["id"] in droplet["backup_ids"]])
+
+    def droplet_neighbor_list(self, id):
+        return self.page("droplets", [])
+
+    def droplet_neighbors_report(self):
+        return self.page("neighbors", [])
+
+    # images
+
+    def image_snapshot(self, droplet, name, type):
+
+        image = {
+            "id": self.id(),
+            "name": name,
+            "distribution": droplet["image"]["distribution"],
+            "slug": None,
+            "public": False,
+            "regions": [droplet["region"]["slug"]],
+            "created_at": timestamp(),
+            "type": type,
+            "min_disk_size": droplet["disk"],
+            "size_gigabytes": 1.5,
+            "_droplet_id": droplet["id"]
+        }
+
+        self.images.append(image)
+        droplet["%s_ids" % type].append(image["id"])
+
+        return image
+
+    def image_list(self):
+
+        images = self.images
+
+        if self.param("type") is not None:
+            images = [image for image in images if image["type"] == self.param("type") and image["public"]]
+
+        if self.param("private") in ["true", "True", "1"]:
+            images = [image for image in images if not image["public"]]
+
+        return self.page("images", images)
+
+    def image_info(self, id_slug):
+        return (200, {"image": public(self.image(id_slug))})
+
+    def image_private(self, id):
+
+        image = self.image(id)
+
+        if image["public"]:
+            raise Unprocessable("public images can't be changed")
+
+        return image
+
+    def image_update(self, id):
+        image = self.image_private(id)
+        self.require("name")
+        image["name"] = self.body["name"]
+        return (200, {"image": public(image)})
+
+    def image_destroy(self, id):
+
+        image = self.image_private(id)
+        self.images.remove(image)
+
+        for droplet in self.droplets:
+            for ids in [droplet["snapshot_ids"], droplet["backup_ids"]]:
+                if image["id"] in ids:
+                    ids.remove(image["id"])
+
+        return (204, None)
+
+    def image_action(self, id):
+
+        image = self.image_private(id)
+        type = self.body.get("type")
+
+        if type == "transfer":
+            region = self.region(self.body.get("region"))
+
+            def apply():
+                if region["slug"] not in image["regions"]:
+                    image["regions"].append(region["slug"])
+        elif type == "convert":
+            if image["type"] != "backup":
+                raise Unprocessable("only backups can be converted")
+
+            def apply():
+                image["type"] = "snapshot"
+        else:
+            raise Unprocessable("%s is not a valid image action" % type)
+
+        return (201, {"action": public(self.action(type, "image", image["id"], None, apply))})
+
+    def image_action_list(self, id):
+        self.image(id)
+        return self.page("actions", self.actions_of("image", id))
+
+    def image_action_info(self, id, action_id):
+        self.image(id)
+        return (200, {"action": public(self.find(self.actions_of("image", id), action_id))})
+
+    # snapshots
+
+    def snapshot_views(self):
+
+        snapshots = []
+
+        for image in self.images:
+            if image["type"] == "snapshot" and not image["public"]:
+                snapshots.append({
+                    "id": str(image["id"]),
+                    "name": image["name"],
+                    "regions": image["regions"],
+                    "created_at": image["created_at"],
+                    "resource_id": str(image.get("_droplet_id")),
+                    "resource_type": "droplet",
+                    "min_disk_size": image["min_disk_size"],
+                    "size_gigabytes": image["size_gigabytes"]
+                })
+
+        return snapshots + self.snapshots
+
+    def snapshot_list(self):
+
+        snapshots = self.snapshot_views()
+
+        if self.param("resource_type") is not None:
+            snapshots = [
+                snapshot for snapshot in snapshots if snapshot["resource_type"] == self.param("resource_type")
+            ]
+
+        return self.page("snapshots", snapshots)
+
+    def snapshot_info(self, id):
+        return (200, {"snapshot": public(self.find(self.snapshot_views(), id))})
+
+    def snapshot_destroy(self, id):
+
+        snapshot = self.find(self.snapshot_views(), id)
+
+        if snapshot["resource_type"] == "droplet":
+            return self.image_destroy(id)
+
+        self.snapshots.remove(snapshot)
+
+        return (204, None)
+
+    # volumes
+
+    def volume_named(self, name, region):
+
+        for volume in self.volumes:
+            if volume["name"] == name and volume["region"]["slug"] == region:
+                return volume
+
+        raise NotFound()
+
+    def volume_list(self):
+
+        volumes = self.volumes
+
+        if self.param("region") is not None:
+            volumes = [volume for volume in volumes if volume["region"]["slug"] == self.param("region")]
+
+        if self.param("name") is not None:
+            volumes = [volume for volume in volumes if volume["name"] == self.param("name")]
+
+        return self.page("volumes", volumes)
+
+    def volume_create(self):
+
+        self.require("name", "size_gigabytes")
+
+        if self.body.get("snapshot_id"):
+            snapshot = self.find(self.snapshots, self.body["snapshot_id"])
+            region = self.region(snapshot["regions"][0])
+            size = snapshot["min_disk_size"]
+        else:
+            self.require("region")
+            region = self.region(self.body["region"])
+            size = self.number("size_gigabytes", self.body["size_gigabytes"])
+
+        if [volume for volume in self.volumes
+                if volume["name"] == self.body["name"] and volume["region"]["slug"] == region["slug"]]:
+            raise FakeAPIError(409, "conflict", "a volume with that name already exists in the region")
+
+        volume = {
+            "id": str(uuid.uuid4()),
+            "region": region,
+            "droplet_ids": [],
+            "name": self.body["name"],
+            "description": self.body.get("description") or "",
+            "size_gigabytes": size,
+            "created_at": timestamp()
+        }
+
+        self.volumes.append(volume)
+
+        return (201, {"volume": public(volume)})
+
+    def volume_info(self, id):
+        return (200, {"volume": public(self.find(self.volumes, id))})
+
+    def volume_remove(self, volume):
+
+        if volume["droplet_ids"]:
+            raise FakeAPIError(409, "conflict", "volumes can't be deleted while attached")
+
+        self.volumes.remove(volume)
+
+        return (204, None)
+
+    def volume_destroy(self, id):
+        return self.volume_remove(self.find(self.volumes, id))
+
+    def volume_destroy_name(self):
+        return self.volume_remove(self.volume_named(self.param("name"), self.param("region")))
+
+    def volume_start(self, volume):
+        """
+        Starts the action in the body on a volume
+        """
+
+        type = self.body.get("type")
+
+        if type in ["attach", "detach"]:
+
+            droplet = self.find(self.droplets, self.body.get("droplet_id"))
+
+            if droplet["region"]["slug"] != volume["region"]["slug"]:
+                raise Unprocessable("the droplet and volume must be in the same region")
+
+            if [action for action in self.actions if action["status"] == "in-progress" and (
+                action.get("_droplet") == droplet["id"] or
+                (action["resource_type"] == "droplet" and action["resource_id"] == droplet["id"])
+            )]:
+                raise Unprocessable("Droplet already has a pending event.")
+
+            if type == "attach" and len(droplet["volume_ids"]) >= 7:
+                raise Unprocessable("droplets can have at most 7 volumes attached")
+
+            if type == "attach" and volume["droplet_ids"] and droplet["id"] not in volume["droplet_ids"]:
+                raise Unprocessable("the volume is already attached to another droplet")
+
+            if type == "detach" and droplet["id"] not in volume["droplet_ids"]:
+                raise Unprocessable("the volume isn't attached to the droplet")
+
+            def apply():
+                if type == "attach":
+                    if droplet["id"] not in volume["droplet_ids"]:
+                        volume["droplet_ids"].append(droplet["id"])
+                    if volume["id"] not in droplet["volume_ids"]:
+                        droplet["volume_ids"].append(volume["id"])
+                else:
+                    if droplet["id"] in volume["droplet_ids"]:
+                        volume["droplet_ids"].remove(droplet["id"])
+                    if volume["id"] in droplet["volume_ids"]:
+                        droplet["volume_ids"].remove(volume["id"])
+
+        elif type == "resize":
+
+            size = self.number("size_gigabytes", self.body.get("size_gigabytes"))
+
+            if size < volume["size_gigabytes"]:
+                raise Unprocessable("volumes can only grow")
+
+            def apply():
+                volume["size_gigabytes"] = size
+
+        else:
+            raise Unprocessable("%s is not a valid volume action" % type)
+
+        if type in ["attach", "detach"]:
+            return self.action(
+                "%s_volume" % type, "backend", 0, volume["region"], apply, volume=volume["id"], droplet=droplet["id"]
+            )
+
+        return self.action("%s_volume" % type, "backend", 0, volume["region"], apply, volume=volume["id"])
+
+    def volume_action(self, id):
+        return (202, {"action": public(self.volume_start(self.find(self.volumes, id)))})
+
+    def volume_action_name(self):
+        volume = self.volume_named(self.body.get("volume_name"), self.body.get("region"))
+        return (202, {"action": public(self.volume_start(volume))})
+
+    def volume_actions(self, id):
+        return [action for action in self.actions if action.get("_volume") == id]
+
+    def volume_action_list(self, id):
+        self.find(self.volumes, id)
+        return self.page("actions", self.volume_actions(id))
+
+    def volume_action_info(self, id, action_id):
+        self.find(self.volumes, id)
+        return (200, {"action": public(self.find(self.volume_actions(id), action_id))})
+
+    def volume_snapshot_list(self, id):
+        self.find(self.volumes, id)
+        return self.page("snapshots", [snapshot for snapshot in self.snapshots if snapshot["resource_id"] == id])
+
+    def volume_snapshot_create(self, id):
+
+        volume = self.find(self.volumes, id)
+        self.require("name")
+
+        snapshot = {
+            "id": str(uuid.uuid4()),
+            "name": self.body["name"],
+            "regions": [volume["region"]["slug"]],
+            "created_at": timestamp(),
+            "resource_id": volume["id"],
+            "resource_type": "volume",
+            "min_disk_size": volume["size_gigabytes"],
+            "size_gigabytes": 0
+        }
+
+        self.snapshots.append(snapshot)
+
+        return (201, {"snapshot": snapshot})
+
+    # floating ips
+
+    def floating_ip_list(self):
+        return self.page("floating_ips", self.floating_ips)
+
+    def floating_ip_assign(self, floating_ip, droplet):
+
+        def apply():
+            if droplet in self.droplets:
+                floating_ip["droplet"] = public(droplet)
+
+        return self.action(
+            "assign_ip", "floating_ip", floating_ip["_number"], floating_ip["region"], apply, ip=floating_ip["ip"]
+        )
+
+    def floating_ip_create(self):
+
+        number = self.id()
+
+        floating_ip = {
+            "ip": self.address("45.55", number),
+            "droplet": None,
+            "_number": number
+        }
+
+        if self.body.get("droplet_id") is not None:
+            droplet = self.find(self.droplets, self.body["droplet_id"])
+            floating_ip["region"] = droplet["region"]
+            self.floating_ips.append(floating_ip)
+            self.floating_ip_assign(floating_ip, droplet)
+        elif self.body.get("region") is not None:
+            floating_ip["region"] = self.region(self.body["region"])
+            self.floating_ips.append(floating_ip)
+        else:
+            raise Unprocessable("droplet_id or region is required")
+
+        return (202, {"floating_ip": public(floating_ip)})
+
+    def floating_ip_info(self, ip):
+        return (200, {"floating_ip": public(self.find(self.floating_ips, ip, "ip"))})
+
+    def floating_ip_destroy(self, ip):
+        self.floating_ips.remove(self.find(self.floating_ips, ip, "ip"))
+        return (204, None)
+
+    def floating_ip_action(self, ip):
+
+        floating_ip = self.find(self.floating_ips, ip, "ip")
+        type = self.body.get("type")
+
+        if type == "assign":
+            droplet = self.find(self.droplets, self.body.get("droplet_id"))
+            if droplet["region"]["slug"] != floating_ip["region"]["slug"]:
+                raise Unprocessable("the droplet and floating ip must be in the same region")
+            action = self.floating_ip_assign(floating_ip, droplet)
+        elif type == "unassign":
+
+            def apply():
+                floating_ip["droplet"] = None
+
+            action = self.action(
+                "unassign_ip", "floating_ip", floating_ip["_number"], floating_ip["region"], apply, ip=ip
+            )
+        else:
+            raise Unprocessable("%s is not a valid floating ip action" % type)
+
+        return (201, {"action": public(action)})
+
+    def floating_ip_actions(self, ip):
+        return [action for action in self.actions if action.get("_ip") == ip]
+
+    def floating_ip_action_list(self, ip):
+        self.find(self.floating_ips, ip, "ip")
+        return self.page("actions", self.floating_ip_actions(ip))
+
+    def floating_ip_action_info(self, ip, action_id):
+        self.find(self.floating_ips, ip, "ip")
+        return (200, {"action": public(self.find(self.floating_ip_actions(ip), action_id))})
+
+    # load balancers
+
+    def load_balancer_view(self, load_balancer):
+
+        view = public(load_balancer)
+
+        if load_balancer["tag"]:
+            view["droplet_ids"] = [droplet["id"] for droplet in self.tagged(load_balancer["tag"])]
+
+        return view
+
+    def load_balancer_list(self):
+        return self.page("load_balancers", [
+            self.load_balancer_view(load_balancer) for load_balancer in self.load_balancers
+        ])
+
+    def load_balancer_settings(self, load_balancer):
+
+        self.require("name", "region", "forwarding_rules")
+
+        load_balancer.update({
+            "name": self.body["name"],
+            "algorithm": self.body.get("algorithm") or "round_robin",
+            "forwarding_rules": self.body["forwarding_rules"],
+            "health_check": self.body.get("health_check") or {
+                "protocol": "http", "port": 80, "path": "/", "check_interval_seconds": 10,
+                "response_timeout_seconds": 5, "healthy_threshold": 5, "unhealthy_threshold": 3
+            },
+            "sticky_sessions": self.body.get("sticky_sessions") or {"type": "none"},
+            "region": self.region(self.body["region"]),
+            "tag": self.body.get("tag") or "",
+            "droplet_ids": [
+                self.number("droplet_ids", droplet_id) for droplet_id in self.body.get("droplet_ids") or []
+            ],
+            "redirect_http_to_https": bool(self.body.get("redirect_http_to_https"))
+        })
+
+        for rule in load_balancer["forwarding_rules"]:
+            rule.setdefault("certificate_id", "")
+            rule.setdefault("tls_passthrough", False)
+
+    def load_balancer_create(self):
+
+        id = str(uuid.uuid4())
+
+        load_balancer = {"id": id, "ip": "", "status": "new", "created_at": timestamp()}
+        self.load_balancer_settings(load_balancer)
+        self.load_balancers.append(load_balancer)
+
+        def active():
+            load_balancer["ip"] = self.address("159.203", self.id())
+            load_balancer["status"] = "active"
+
+        self.later(self.action_seconds, active)
+
+        return (202, {"load_balancer": self.load_balancer_view(load_balancer)})
+
+    def load_balancer_info(self, id):
+        return (200, {"load_balancer": self.load_balancer_view(self.find(self.load_balancers, id))})
+
+    def load_balancer_update(self, id):
+        load_balancer = self.find(self.load_balancers, id)
+        self.load_balancer_settings(load_balancer)
+        return (200, {"load_balancer": self.load_balancer_view(load_balancer)})
+
+    def load_balancer_destroy(self, id):
+        self.load_balancers.remove(self.find(self.load_balancers, id))
+        return (204, None)
+
+    def load_balancer_droplet_add(self, id):
+
+        load_balancer = self.find(self.load_balancers, id)
+
+        for droplet_id in self.body.get("droplet_ids") or []:
+            droplet_id = self.find(self.droplets, droplet_id)["id"]
+            if droplet_id not in load_balancer["droplet_ids"]:
+                load_balancer["droplet_ids"].append(droplet_id)
+
+        return (204, None)
+
+    def load_balancer_droplet_remove(self, id):
+
+        load_balancer = self.find(self.load_balancers, id)
+
+        for droplet_id in self.body.get("droplet_ids") or []:
+            droplet_id = self.number("droplet_ids", droplet_id)
+            if droplet_id in load_balancer["droplet_ids"]:
+                load_balancer["droplet_ids"].remove(droplet_id)
+
+        return (204, None)
+
+    def load_balancer_rule_add(self, id):
+
+        load_balancer = self.find(self.load_balancers, id)
+
+        for rule in self.body.get("forwarding_rules") or []:
+            rule.setdefault("certificate_id", "")
+            rule.setdefault("tls_passthrough", False)
+            load_balancer["forwarding_rules"].append(rule)
+
+        return (204, None)
+
+    def load_balancer_rule_remove(self, id):
+
+        load_balancer = self.find(self.load_balancers, id)
+        keys = ["entry_protocol", "entry_port", "target_protocol", "target_port"]
+
+        for remove in self.body.get("forwarding_rules") or []:
+            load_balancer["forwarding_rules"] = [
+                rule for rule in load_balancer["forwarding_rules"]
+                if [rule.get(key) for key in keys] != [remove.get(key) for key in keys]
+            ]
+
+        return (204, None)
+
+    # certificates
+
+    def certificate_list(self):
+        return self.page("certificates", self.certificates)
+
+    def certificate_create(self):
+
+        self.require("name", "private_key", "leaf_certificate")
+
+        body = "".join([
+            line for line in self.body["leaf_certificate"].splitlines() if line and not line.startswith("-----")
+        ])
+
+        try:
+            der = base64.b64decode(body.encode("ascii"))
+        except (TypeError, ValueError):
+            raise Unprocessable("the leaf certificate must be PEM encoded")
+
+        certificate = {
+            "id": str(uuid.uuid4()),
+            "name": self.body["name"],
+            "not_after": timestamp(time.time() + 365 * 86400),
+            "sha1_fingerprint": hashlib.sha1(der).hexdigest(),
+            "created_at": timestamp()
+        }
+
+        self.certificates.append(certificate)
+
+        return (201, {"certificate": certificate})
+
+    def certificate_info(self, id):
+        return (200, {"certificate": self.find(self.certificates, id)})
+
+    def certificate_destroy(self, id):
+        self.certificates.remove(self.find(self.certificates, id))
+        return (204, None)
+
+    # domains
+
+    def domain(self, name):
+        return self.find(self.domains, name, "name")
+
+    def domain_view(self, domain):
+        """
+        Domain with its zone file rendered from its records
+        """
+
+        lines = ["$ORIGIN %s." % domain["name"], "$TTL %s" % domain["ttl"]]
+
+        for record in self.records[domain["name"]]:
+
+            data = record["data"]
+
+            if record["type"] == "MX":
+                data = "%s %s" % (record["priority"], data)
+            elif record["type"] == "SRV":
+                data = "%s %s %s %s" % (record["priority"], record["weight"], record["port"], data)
+            elif record["type"] == "CAA":
+                data = "%s %s \"%s\"" % (record["flags"], record["tag"], data)
+            elif record["type"] == "TXT":
+                data = "\"%s\"" % data
+
+            lines.append("%s %s IN %s %s" % (record["name"], record["ttl"], record["type"], data))
+
+        view = dict(domain)
+        view["zone_file"] = "\n".join(lines) + "\n"
+
+        return view
+
+    def domain_list(self):
+        return self.page("domains", [self.domain_view(domain) for domain in self.domains])
+
+    def domain_create(self):
+
+        self.require("name")
+
+        name = self.body["name"]
+
+        if [domain for domain in self.domains if domain["name"] == name]:
+            raise Unprocessable("Name already exists")
+
+        domain = {"name": name, "ttl": 1800}
+        self.domains.append(domain)
+        self.records[name] = []
+
+        self.record_add(name, {
+            "type": "SOA", "name": "@", "data": "1800", "ttl": 1800
+        })
+
+        for number in range(1, 4):
+            self.record_add(name, {
+                "type": "NS", "name": "@", "data": "ns%s.digitalocean.com" % number, "ttl": 1800
+            })
+
+        if self.body.get("ip_address"):
+            self.record_add(name, {"type": "A", "name": "@", "data": self.body["ip_address"], "ttl": 1800})
+
+        return (201, {"domain": {"name": name, "ttl": None, "zone_file": None}})
+
+    def domain_info(self, name):
+        return (200, {"domain": self.domain_view(self.domain(name))})
+
+    def domain_destroy(self, name):
+        self.domains.remove(self.domain(name))
+        del self.records[name]
+        return (204, None)
+
+    def record_add(self, name, attribs):
+
+        record = {
+            "id": self.id(),
+            "type": None,
+            "name": None,
+            "data": None,
+            "priority": None,
+            "port": None,
+            "ttl": 1800,
+            "weight": None,
+            "flags": None,
+            "tag": None
+        }
+
+        self.record_set(name, record, attribs)
+        self.records[name].append(record)
+
+        return record
+
+    def record_set(self, name, record, attribs):
+
+        for (key, value) in attribs.items():
+            if key in record and key != "id":
+                record[key] = value
+
+        if record["type"] not in RECORD_TYPES:
+            raise Unprocessable("%s is not a valid record type" % record["type"])
+
+        if not record["name"]:
+            raise Unprocessable("Name can't be blank")
+
+        if record["data"] in [None, ""]:
+            raise Unprocessable("Data can't be blank")
+
+        if hasattr(record["data"], "rstrip") and record["data"].rstrip(".") == name:
+            record["data"] = "@"
+
+        if record["type"] in ["MX", "SRV"] and record["priority"] is None:
+            raise Unprocessable("Priority can't be blank")
+
+        if record["type"] == "SRV" and (record["port"] is None or record["weight"] is None):
+            raise Unprocessable("Port and weight can't be blank")
+
+    def record_list(self, name):
+        self.domain(name)
+        return self.page("domain_records", self.records[name])
+
+    def record_create(self, name):
+        self.domain(name)
+        return (201, {"domain_record": self.record_add(name, self.body)})
+
+    def record_info(self, name, record_id):
+        self.domain(name)
+        return (200, {"domain_record": self.find(self.records[name], record_id)})
+
+    def record_update(self, name, record_id):
+
+        self.domain(name)
+        record = self.find(self.records[name], record_id)
+        updated = dict(record)
+
+        self.record_set(name, updated, self.body)
+        record.update(updated)
+
+        return (200, {"domain_record": record})
+
+    def record_destroy(self, name, record_id):
+        self.domain(name)
+        self.records[name].remove(self.find(self.records[name], record_id))
+        return (204, None)
+
+    # tags
+
+    def tag_view(self, tag):
+
+        droplets = self.tagged(tag["name"])
+
+        return {
+            "name": tag["name"],
+            "resources": {"droplets": {
+                "count": len(droplets),
+                "last_tagged": public(droplets[-1]) if droplets else None
+            }}
+        }
+
+    def tag_list(self):
+        return self.page("tags", [self.tag_view(tag) for tag in self.tags])
+
+    def tag_create(self):
+        self.require("name")
+        return (201, {"tag": self.tag_view(self.tag_present(self.body["name"]))})
+
+    def tag_info(self, name):
+        return (200, {"tag": self.tag_view(self.find(self.tags, name, "name"))})
+
+    def tag_update(self, name):
+
+        tag = self.find(self.tags, name, "name")
+        self.require("name")
+        self.tag_present(self.body["name"])
+        self.tags.remove(tag)
+
+        for droplet in self.tagged(name):
+            droplet["tags"][droplet["tags"].index(name)] = self.body["name"]
+
+        return (200, {"tag": self.tag_view(self.find(self.tags, self.body["name"], "name"))})
+
+    def tag_destroy(self, name):
+
+        self.tags.remove(self.find(self.tags, name, "name"))
+
+        for droplet in self.tagged(name):
+            droplet["tags"].remove(name)
+
+        return (204, None)
+
+    def tag_resources(self, name):
+
+        self.find(self.tags, name, "name")
+        resources = self.body.get("resources")
+
+        if not isinstance(resources, list) or not resources:
+            raise Unprocessable("resources must be a list of resources")
+
+        droplets = []
+
+        for resource in resources:
+
+            if resource.get("resource_type") != "droplet":
+                raise Unprocessable("only droplets can be tagged")
+
+            droplets.append(self.find(self.droplets, resource.get("resource_id")))
+
+        return droplets
+
+    def tag_attach(self, name):
+
+        for droplet in self.tag_resources(name):
+            if name not in droplet["tags"]:
+                droplet["tags"].append(name)
+
+        return (204, None)
+
+    def tag_detach(self, name):
+
+        for droplet in self.tag_resources(name):
+            if name in droplet["tags"]:
+                droplet["tags"].remove(name)
+
+        return (204, None)
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    """
+    Turns HTTP requests into FakeAPI calls
+    """
+
+    protocol_version = "HTTP/1.1"
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def respond(self, status, body, headers=None):
+
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+
+        self.send_response(status)
+
+        for (name, value) in (headers or {}).items():
+            self.send_header(name, value)
+
+        if body is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def dispatch(self):
+
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+
+        url = urlparse(self.path)
+        api = self.server.api
+
+        (headers, over) = api.limit()
+
+        if over:
+            return self.respond(429, {
+                "id": "too_many_requests", "message": "API Rate limit exceeded."
+            }, headers)
+
+        if not (self.headers.get("Authorization") or "").startswith("Bearer ") or \
+           not self.headers.get("Authorization")[7:].strip():
+            return self.respond(401, {
+                "id": "unauthorized", "message": "Unable to authenticate you."
+            }, headers)
+
+        try:
+            body = json.loads(raw.decode("utf-8")) if raw else None
+        except ValueError:
+            return self.respond(400, {"id": "bad_request", "message": "invalid JSON"}, headers)
+
+        host = self.headers.get("Host") or "%s:%s" % self.server.server_address[:2]
+
+        try:
+            (status, result) = api.handle(
+                self.command, url.path.rstrip("/"), parse_qs(url.query), body,
+                "http://%s%s" % (host, url.path)
+            )
+        except FakeAPIError as exception:
+            (status, result) = (exception.status, {"id": exception.id, "message": exception.message})
+
+        self.respond(status, result, headers)
+
+    do_GET = dispatch
+    do_POST = dispatch
+    do_PUT = dispatch
+    do_DELETE = dispatch
+
+
+class FakeAPIServer(ThreadingMixIn, HTTPServer):
+    """
+    Threaded HTTP server for a FakeAPI
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, api):
+        HTTPServer.__init__(self, address, FakeAPIHandler)
+        self.api = api
+        self.url = "http://%s:%s/v2" % self.server_address[:2]
+
+
+def start(host="127.0.0.1", port=0, **settings):
+    """
+    Serves a FakeAPI on a thread, returning the server (stop with shutdown())
+    """
+
+    server = FakeAPIServer((host, port), FakeAPI(**settings))
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Fake DigitalOcean API for offline tests and benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--action-seconds", type=float, default=2.0,
+                        help="seconds most actions take to complete (default 2)")
+    parser.add_argument("--rate-limit", type=int, default=5000,
+                        help="requests allowed per rate window (default 5000)")
+    parser.add_argument("--rate-window", type=int, default=3600,
+                        help="seconds in a rate window (default 3600)")
+    parser.add_argument("--per-page-max", type=int, default=200,
+                        help="most items a page can have (default 200)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every request (default 0)")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+
+    args = parser.parse_args(argv)
+
+    FakeAPIHandler.verbose = args.verbose
+
+    server = FakeAPIServer((args.host, args.port), FakeAPI(
+        action_seconds=args.action_seconds,
+        rate_limit=args.rate_limit,
+        rate_window=args.rate_window,
+        per_page_max=args.per_page_max,
+        latency=args.latency
+    ))
+
+    sys.stdout.write("fake DO API at %s\n" % server.url)
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Checks the module utils' response cache invalidation without the API
+
+    python -m unittest discover -s tests -p "test_*.py"
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import ansible.module_utils
+    ansible.module_utils.__path__.insert(0, os.path.join(ROOT, "ansible", "module_utils"))
+    from ansible.module_utils.doboto_module import invalidate, DOBOTOCache
+    HAS_ANSIBLE = True
+except (ImportError, AttributeError):
+    # without ansible installed, ansible here is just this repo's namespace package
+    HAS_ANSIBLE = False
+
+
+class Module(object):
+
+    def __init__(self, **params):
+        self.params = params
+
+
+class Runner(object):
+
+    def __init__(self, path, pending, **params):
+        self.module = Module(**params)
+        self.cache = DOBOTOCache("token", "url", path)
+        self.pending = pending
+
+    if HAS_ANSIBLE:
+
+        @invalidate("image", "volume")
+        def destroy(self):
+            pass
+
+        @invalidate("volume", when="volume")
+        def create(self):
+            pass
+
+
+@unittest.skipUnless(HAS_ANSIBLE, "ansible is required")
+class TestInvalidate(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_holds_every_resource(self):
+
+        runner = Runner(self.path, [1, 2])
+        runner.cache.set("image", "list", ["stale"])
+        runner.cache.set("volume", "list", ["stale"])
+
+        runner.destroy()
+
+        self.assertEqual(runner.cache.get("image", "list", 60), (False, None))
+        self.assertEqual(runner.cache.get("volume", "list", 60), (False, None))
+        self.assertEqual(runner.cache.held("image"), [1, 2])
+        self.assertEqual(runner.cache.held("volume"), [1, 2])
+
+    def test_holds_nothing_when_nothing_pending(self):
+
+        runner = Runner(self.path, [])
+
+        runner.destroy()
+
+        self.assertEqual(runner.cache.held("image"), [])
+        self.assertEqual(runner.cache.held("volume"), [])
+
+    def test_when_unset_keeps_cache(self):
+
+        runner = Runner(self.path, [1], volume=None)
+        runner.cache.set("volume", "list", ["kept"])
+
+        runner.create()
+
+        self.assertEqual(runner.cache.get("volume", "list", 60), (True, ["kept"]))
+        self.assertEqual(runner.cache.held("volume"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()